@@ -0,0 +1,108 @@
+import re
+from collections import deque
+from typing import Generator, Iterable, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик для одновременного поиска нескольких байтовых паттернов.
+    Автомат строится один раз, после чего поток данных просматривается
+    за один проход независимо от количества паттернов.
+    """
+
+    def __init__(self, patterns: Iterable[bytes]):
+        self.patterns: List[bytes] = []
+        for pattern in patterns:
+            if not pattern:
+                raise ValueError("Паттерн не может быть пустым.")
+            if pattern not in self.patterns:
+                self.patterns.append(pattern)
+
+        self._lengths = [len(p) for p in self.patterns]
+        self._build()
+
+    def _build(self) -> None:
+        """Построение бора и перевод его в полную таблицу переходов (ДКА)."""
+        goto = [{}]
+        out = [[]]
+
+        for idx, pattern in enumerate(self.patterns):
+            state = 0
+            for byte in pattern:
+                if byte not in goto[state]:
+                    goto.append({})
+                    out.append([])
+                    goto[state][byte] = len(goto) - 1
+                state = goto[state][byte]
+            out[state].append(idx)
+
+        # Обход в ширину: суффиксные ссылки и переходы для отсутствующих байтов
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = [goto[0].get(b, 0) for b in range(256)]
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            link = fail[state]
+            out[state].extend(out[link])
+            row = list(delta[link])
+            for byte, nxt in goto[state].items():
+                row[byte] = nxt
+                fail[nxt] = delta[link][byte]
+                queue.append(nxt)
+            delta[state] = row
+
+        self._delta = delta
+        self._out = [tuple(o) for o in out]
+
+        # Из начального состояния можно сразу перескакивать к байтам,
+        # с которых начинается хотя бы один паттерн
+        first_bytes = sorted(goto[0])
+        self._skip = re.compile(
+            b'[' + b''.join(re.escape(bytes([b])) for b in first_bytes) + b']'
+        ) if first_bytes else None
+
+    def scan(self, chunk: bytes, start: int = 0, state: int = 0) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Поиск в одном чанке, начинающемся со смещения start.
+        state - состояние автомата после предыдущего чанка (0 - начало потока).
+        Возвращает найденные пары (индекс паттерна, смещение) и новое состояние.
+        """
+        matches = []
+        if self._skip is None:
+            return matches, state
+
+        delta = self._delta
+        out = self._out
+        lengths = self._lengths
+        skip = self._skip.search
+        pos = 0
+        size = len(chunk)
+
+        while pos < size:
+            if state == 0:
+                match = skip(chunk, pos)
+                if match is None:
+                    break
+                pos = match.start()
+            state = delta[state][chunk[pos]]
+            pos += 1
+            if out[state]:
+                end = start + pos
+                for idx in out[state]:
+                    matches.append((idx, end - lengths[idx]))
+        return matches, state
+
+    def iter_matches(self, chunks: Iterable[bytes], start: int = 0) -> Generator[Tuple[int, int], None, None]:
+        """
+        Поиск по потоку последовательных чанков.
+        Возвращает пары (индекс паттерна, смещение начала совпадения)
+        в порядке конца совпадения; совпадения на границах чанков не теряются.
+        """
+        state = 0
+        base = start
+        for chunk in chunks:
+            matches, state = self.scan(chunk, base, state)
+            yield from matches
+            base += len(chunk)
@@ -0,0 +1,235 @@
+import hashlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .byte_histogram import ByteHistogram
+from .entropy_profile import EntropyProfile, block_entropy
+from .file_carver import FileCarver
+from .repeat_finder import RepeatFinder, find_repeats
+
+
+class ChunkConsumer(ABC):
+    """
+    Анализатор, получающий файл последовательными чанками.
+    Все чанки приходят по порядку; после последнего вызывается result().
+    """
+
+    name = 'consumer'
+
+    @abstractmethod
+    def feed(self, offset: int, chunk: bytes) -> None:
+        """Обработка очередного чанка, начинающегося со смещения offset."""
+
+    @abstractmethod
+    def result(self):
+        """Итог анализа после последнего чанка."""
+
+
+class HistogramConsumer(ChunkConsumer):
+    name = 'histogram'
+
+    def __init__(self):
+        self.histogram = ByteHistogram()
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        self.histogram.update(chunk)
+
+    def result(self) -> ByteHistogram:
+        return self.histogram
+
+
+class EntropyConsumer(ChunkConsumer):
+    """Энтропия по блокам; блоки, попавшие на границу чанков, собираются из частей."""
+
+    name = 'entropy'
+
+    def __init__(self, block_size: int = 64 * 1024):
+        self.profile = EntropyProfile(block_size)
+        self._pending = b''
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        block_size = self.profile.block_size
+        data = self._pending + chunk if self._pending else chunk
+        full = len(data) - len(data) % block_size
+        entropies = self.profile.entropies
+        for i in range(0, full, block_size):
+            entropies.append(block_entropy(data[i:i + block_size]))
+        self._pending = data[full:]
+        self.profile.size = offset + len(chunk)
+
+    def result(self) -> EntropyProfile:
+        if self._pending:
+            self.profile.entropies.append(block_entropy(self._pending))
+            self._pending = b''
+        return self.profile
+
+
+class PatternConsumer(ChunkConsumer):
+    """
+    Повторяющиеся паттерны за тот же проход: просмотренные блоки
+    сохраняются, и в result() по ним работает find_repeats - так же,
+    как в BinaryAnalyzer.find_patterns, но без повторного чтения файла.
+
+    Если файл больше max_bytes, просматриваются только равномерно
+    выбранные блоки общим объемом около max_bytes, количество
+    пересчитывается на весь файл и помечается 'approximate': True.
+    В памяти хранится не больше max_bytes байтов файла.
+    """
+
+    name = 'patterns'
+
+    def __init__(self, size: int, max_bytes: int, min_length: int = 4, max_length: Optional[int] = None,
+                 max_patterns: int = 20, capacity: int = 200000):
+        # Те же ограничения, что и в BinaryAnalyzer.find_patterns
+        self.max_length = min(max_length or min_length + 3, size // 2 - 1)
+        self.enabled = size >= min_length * 2 and self.max_length >= min_length
+        self.min_length = min_length
+        self.max_patterns = max_patterns
+        self.capacity = capacity
+        self.size = size
+
+        # Смещения выбранных блоков (None - весь файл)
+        self._offsets: Optional[List[int]] = None
+        if size > max_bytes:
+            self._offsets = RepeatFinder.sample_offsets(size, max_bytes / size)
+        self._blocks: List[tuple] = []
+        self._next = 0
+        self._block_end = 0
+        self.sampled_bytes = 0
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        if not self.enabled:
+            return
+        if self._offsets is None:
+            self._take(offset, chunk)
+            return
+
+        # Части выбранных блоков внутри чанка (блок может начаться в предыдущем)
+        end = offset + len(chunk)
+        pos = offset
+        while pos < end:
+            if pos >= self._block_end:
+                if self._next >= len(self._offsets) or self._offsets[self._next] >= end:
+                    return
+                pos = max(pos, self._offsets[self._next])
+                self._block_end = self._offsets[self._next] + RepeatFinder.BLOCK_SIZE
+                self._next += 1
+            stop = min(end, self._block_end)
+            self._take(pos, chunk[pos - offset:stop - offset])
+            pos = stop
+
+    def _take(self, offset: int, data: bytes) -> None:
+        self._blocks.append((offset, data))
+        self.sampled_bytes += len(data)
+
+    def result(self) -> List[Dict]:
+        if not self.enabled or not self.sampled_bytes:
+            return []
+        blocks, self._blocks = self._blocks, []
+        return find_repeats(
+            lambda: iter(blocks), self.min_length, self.max_length, self.max_patterns,
+            self.capacity, self.sampled_bytes, self.size / self.sampled_bytes
+        )
+
+
+class SignatureConsumer(ChunkConsumer):
+    """
+    Тип файла по заголовку (classify получает первые header_size байтов)
+    и, если передан carver, встроенные файлы по всем смещениям.
+    """
+
+    name = 'signatures'
+
+    def __init__(self, classify: Callable[[bytes], str], header_size: int,
+                 carver: Optional[FileCarver] = None):
+        self.classify = classify
+        self.header_size = header_size
+        self.carver = carver
+        self._header = b''
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        if len(self._header) < self.header_size:
+            self._header += chunk[:self.header_size - len(self._header)]
+        if self.carver is not None:
+            self.carver.feed(offset, chunk)
+
+    def result(self) -> Dict:
+        result = {'file_type': self.classify(self._header)}
+        if self.carver is not None:
+            result['carved'] = self.carver.result()
+        return result
+
+
+class ChecksumConsumer(ChunkConsumer):
+    name = 'checksums'
+
+    def __init__(self, algorithms: Iterable[str] = ('md5', 'sha256')):
+        self.hashers = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        for hasher in self.hashers.values():
+            hasher.update(chunk)
+
+    def result(self) -> Dict[str, str]:
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()}
+
+
+class AnalysisPipeline:
+    """
+    Однопроходный анализ: файл читается один раз, каждый чанк передается
+    всем зарегистрированным анализаторам. В режиме threaded каждый анализатор
+    работает в своем потоке (порядок чанков для него сохраняется), а чтение
+    опережает самый медленный анализатор не более чем на max_ahead чанков.
+    """
+
+    def __init__(self, chunk_size: int = 1024 * 1024, threaded: bool = False, max_ahead: int = 2):
+        self.chunk_size = chunk_size
+        self.threaded = threaded
+        self.max_ahead = max_ahead
+        self.consumers: List[ChunkConsumer] = []
+
+    def add(self, consumer: ChunkConsumer) -> 'AnalysisPipeline':
+        if any(c.name == consumer.name for c in self.consumers):
+            raise ValueError(f"Анализатор '{consumer.name}' уже добавлен.")
+        self.consumers.append(consumer)
+        return self
+
+    def run(self, path: str) -> Dict:
+        """Прогон файла через все анализаторы; результат - словарь имя -> результат."""
+        with open(path, mode='rb') as f:
+            chunks = self._chunks(f)
+            if self.threaded and len(self.consumers) > 1:
+                self._run_threaded(chunks)
+            else:
+                for offset, chunk in chunks:
+                    for consumer in self.consumers:
+                        consumer.feed(offset, chunk)
+        return {consumer.name: consumer.result() for consumer in self.consumers}
+
+    def _chunks(self, f):
+        offset = 0
+        while chunk := f.read(self.chunk_size):
+            yield offset, chunk
+            offset += len(chunk)
+
+    def _run_threaded(self, chunks) -> None:
+        # По одному потоку на анализатор: чанки для него выполняются строго по очереди
+        executors = [ThreadPoolExecutor(max_workers=1) for _ in self.consumers]
+        in_flight = deque()
+        try:
+            for offset, chunk in chunks:
+                in_flight.append([
+                    executor.submit(consumer.feed, offset, chunk)
+                    for executor, consumer in zip(executors, self.consumers)
+                ])
+                if len(in_flight) > self.max_ahead:
+                    for future in in_flight.popleft():
+                        future.result()
+            while in_flight:
+                for future in in_flight.popleft():
+                    future.result()
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True, cancel_futures=True)
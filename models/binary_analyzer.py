@@ -1,5 +1,15 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .analysis_pipeline import (
+    AnalysisPipeline, ChecksumConsumer, EntropyConsumer, HistogramConsumer, PatternConsumer, SignatureConsumer
+)
 from .binary_file import BinaryFile
-from typing import Dict, Optional
+from .entropy_profile import SPARK_CHARS, EntropyProfile
+from .file_carver import FileCarver
+from .repeat_finder import RepeatFinder, find_repeats
+from .signature_index import SignatureIndex
+from .structure_estimator import StructureEstimator
+from typing import Dict, Iterable, List, Optional
 
 
 class BinaryAnalyzer:
@@ -29,7 +39,7 @@ class BinaryAnalyzer:
         b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1': 'Microsoft Office Document (DOC/XLS/PPT)',
         b'\x49\x44\x33': 'MP3 Audio (ID3v2)',
         b'\xFF\xFB': 'MP3 Audio',
-        b'\x66\x74\x79\x70': 'MP4 Video (at offset 4)',
+        (4, b'\x66\x74\x79\x70'): 'MP4 Video',
         b'\x00\x00\x00\x20\x66\x74\x79\x70': 'MP4 Video',
         b'\x52\x49\x46\x46': 'RIFF (AVI/WAV)',
         b'\x4F\x67\x67\x53': 'OGG Audio',
@@ -37,26 +47,65 @@ class BinaryAnalyzer:
         b'\x30\x26\xB2\x75\x8E\x66\xCF\x11': 'WMA/WMV',
     }
 
+    # Индекс сигнатур строится один раз при загрузке класса
+    _signature_index = SignatureIndex.from_dict(FILE_SIGNATURES)
+
     def __init__(self, file: BinaryFile):
         self.file = file
 
+    @classmethod
+    def load_signatures(cls, path: str) -> int:
+        """
+        Добавление сигнатур из файла (формат: [смещение:]hex = Название).
+        Возвращает количество загруженных сигнатур.
+        """
+        signatures = SignatureIndex.parse_file(path)
+        cls.FILE_SIGNATURES = {**cls.FILE_SIGNATURES, **signatures}
+        cls._signature_index = SignatureIndex.from_dict(cls.FILE_SIGNATURES)
+        return len(signatures)
+
+    @classmethod
+    def _header_size(cls) -> int:
+        return max(16, cls._signature_index.header_size)
+
+    @classmethod
+    def classify_header(cls, header: bytes) -> str:
+        """Определение типа по первым байтам файла."""
+        file_type = cls._signature_index.match(header)
+        if file_type:
+            return file_type
+
+        # Проверяем текстовый файл
+        if cls._is_text_file(header):
+            return 'Text File'
+
+        return 'Unknown Binary File'
+
     def detect_file_type(self) -> Optional[str]:
         """Определение типа файла по сигнатуре."""
         if not self.file.exists():
             return None
 
-        signature = self.file.get_file_signature()
+        return self.classify_header(self.file.read_bytes(0, self._header_size()))
 
-        # Проверяем известные сигнатуры
-        for sig, file_type in self.FILE_SIGNATURES.items():
-            if signature.startswith(sig):
-                return file_type
+    @classmethod
+    def detect_file_types(cls, paths: Iterable[str], workers: int = 16) -> Dict[str, Optional[str]]:
+        """
+        Определение типов множества файлов.
+        Читаются только заголовки, чтение идет параллельно в нескольких потоках.
+        """
+        header_size = cls._header_size()
 
-        # Проверяем текстовый файл
-        if self._is_text_file(signature):
-            return 'Text File'
+        def detect(path: str) -> Optional[str]:
+            try:
+                with open(path, mode='rb') as f:
+                    return cls.classify_header(f.read(header_size))
+            except OSError:
+                return None
 
-        return 'Unknown Binary File'
+        paths = list(paths)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(paths, pool.map(detect, paths)))
 
     @staticmethod
     def _is_text_file(data: bytes, sample_size: int = 512) -> bool:
@@ -72,40 +121,73 @@ class BinaryAnalyzer:
 
         return non_text / len(sample) < 0.3 if sample else False
 
-    def analyze_structure(self) -> Dict:
-        """Анализ структуры бинарного файла."""
+    def analyze_structure(self, approximate: bool = False, sample_blocks: int = 256,
+                          block_size: int = 16 * 1024, sampling: str = 'stratified',
+                          seed: Optional[int] = None) -> Dict:
+        """
+        Анализ структуры бинарного файла.
+        approximate=True - оценка по sample_blocks блокам (см. StructureEstimator):
+        результат содержит 'approximate': True и доверительные интервалы (*_ci).
+        Если выборка покрывает весь файл, выполняется точный анализ.
+        """
         if not self.file.exists():
             return {'error': 'Файл не найден'}
 
-        size = self.file.get_size()
-        distribution = self.file.get_byte_distribution()
-
-        # Подсчет статистики
-        total_bytes = sum(distribution.values())
-        non_zero_bytes = sum(1 for count in distribution.values() if count > 0)
-
-        # Энтропия (по формуле Шеннона)
-        import math
-        entropy = 0.0
-        if total_bytes > 0:
-            for count in distribution.values():
-                if count > 0:
-                    probability = count / total_bytes
-                    entropy -= probability * math.log2(probability)
-
-        # Наиболее частые байты
-        most_common = sorted(
-            [(byte, count) for byte, count in distribution.items() if count > 0],
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
+        if approximate:
+            estimator = StructureEstimator(self.file.path, sample_blocks, block_size, sampling, seed)
+            if not estimator.covers_file(self.file.get_size()):
+                analysis = estimator.estimate(self._classify_block)
+                analysis['file_type'] = self.detect_file_type()
+                return analysis
+
+        results = self.build_pipeline(patterns=False, entropy=False, checksums=False).run(self.file.path)
+        return self._structure(results)
+
+    # Энтропия, начиная с которой блок считается сжатым или зашифрованным
+    HIGH_ENTROPY = 7.5
+    # Сколько байтов файла просматривает поиск паттернов в однопроходном отчете
+    PATTERN_SAMPLE_BYTES = 2 * 1024 * 1024
+
+    @classmethod
+    def _classify_block(cls, block: bytes, entropy: float) -> str:
+        """Класс содержимого блока для оценки состава файла."""
+        if entropy == 0.0 and block[:1] == b'\x00':
+            return 'Нулевые байты'
+        if entropy >= cls.HIGH_ENTROPY:
+            return 'Сжатые / зашифрованные данные'
+        if cls._is_text_file(block):
+            return 'Текст'
+        return 'Двоичные данные'
+
+    def build_pipeline(self, patterns: bool = True, entropy: bool = True, checksums: bool = True,
+                       carve: bool = False, threaded: bool = False) -> AnalysisPipeline:
+        """
+        Однопроходный конвейер анализаторов: гистограмма и сигнатуры всегда,
+        остальные - по флагам. При threaded анализаторы работают в отдельных потоках.
+        """
+        pipeline = AnalysisPipeline(BinaryFile.BUFFER_SIZE, threaded=threaded)
+        pipeline.add(HistogramConsumer())
+        carver = FileCarver(self.FILE_SIGNATURES) if carve else None
+        pipeline.add(SignatureConsumer(self.classify_header, self._header_size(), carver))
+        if patterns:
+            pipeline.add(PatternConsumer(size=self.file.get_size(), max_bytes=self.PATTERN_SAMPLE_BYTES))
+        if entropy:
+            pipeline.add(EntropyConsumer())
+        if checksums:
+            pipeline.add(ChecksumConsumer())
+        return pipeline
+
+    def _structure(self, results: Dict) -> Dict:
+        """Результат analyze_structure по результатам конвейера."""
+        histogram = results['histogram']
+        total_bytes = histogram.total
 
         return {
-            'file_type': self.detect_file_type(),
-            'size': size,
+            'file_type': results['signatures']['file_type'],
+            'size': total_bytes,
             'total_bytes': total_bytes,
-            'unique_bytes': non_zero_bytes,
-            'entropy': entropy,
+            'unique_bytes': histogram.unique_bytes(),
+            'entropy': histogram.entropy(),
             'most_common_bytes': [
                 {
                     'byte': f"0x{byte:02X}",
@@ -114,64 +196,119 @@ class BinaryAnalyzer:
                     'count': count,
                     'percentage': (count / total_bytes * 100) if total_bytes > 0 else 0
                 }
-                for byte, count in most_common
+                for byte, count in histogram.most_common(10)
             ],
-            'null_bytes': distribution[0],
-            'null_percentage': (distribution[0] / total_bytes * 100) if total_bytes > 0 else 0
+            'null_bytes': histogram.counts[0],
+            'null_percentage': histogram.null_ratio() * 100
         }
 
-    def find_patterns(self, min_length: int = 4, max_patterns: int = 20) -> list:
-        """Поиск повторяющихся паттернов."""
+    def find_patterns(self, min_length: int = 4, max_patterns: int = 20, max_length: Optional[int] = None,
+                      sample_ratio: float = 1.0, capacity: int = 200000) -> list:
+        """
+        Поиск повторяющихся паттернов длиной от min_length до max_length
+        (по умолчанию min_length + 3), см. find_repeats. Память ограничена
+        capacity кандидатами. При sample_ratio < 1 все проходы идут только
+        по этой доле блоков файла, количество пересчитывается на весь файл
+        и помечается 'approximate': True.
+        """
         if not self.file.exists():
             return []
 
-        data = self.file.read_bytes()
-        if len(data) < min_length * 2:
+        size = self.file.get_size()
+        if size < min_length * 2:
             return []
 
-        patterns = {}
-
-        # Поиск паттернов заданной длины
-        for length in range(min_length, min(min_length + 4, len(data) // 2)):
-            for i in range(len(data) - length + 1):
-                pattern = data[i:i + length]
-
-                # Пропускаем паттерны из одинаковых байтов
-                if len(set(pattern)) == 1:
-                    continue
-
-                pattern_key = pattern.hex()
-                if pattern_key not in patterns:
-                    patterns[pattern_key] = {
-                        'pattern': pattern,
-                        'length': length,
-                        'offsets': []
-                    }
-
-                if len(patterns[pattern_key]['offsets']) < 100:
-                    patterns[pattern_key]['offsets'].append(i)
-
-        # Фильтруем паттерны, встречающиеся более одного раза
-        repeated = [
-            {
-                'pattern': p['pattern'].hex(),
-                'length': p['length'],
-                'count': len(p['offsets']),
-                'first_offset': p['offsets'][0],
-                'offsets': p['offsets'][:10]  # Показываем первые 10
-            }
-            for p in patterns.values() if len(p['offsets']) > 1
-        ]
-
-        # Сортируем по частоте встречаемости
-        repeated.sort(key=lambda x: x['count'], reverse=True)
-
-        return repeated[:max_patterns]
-
-    def write_report(self, report_path: str, encoding: str = 'utf-8') -> None:
-        """Запись отчета о бинарном файле."""
-        analysis = self.analyze_structure()
-        patterns = self.find_patterns()
+        max_length = min(max_length or min_length + 3, size // 2 - 1)
+        if max_length < min_length:
+            return []
+
+        sampled_bytes = self._sampled_bytes(sample_ratio) if sample_ratio < 1.0 else size
+        return find_repeats(
+            lambda: self._sampled_chunks(sample_ratio), min_length, max_length,
+            max_patterns, capacity, sampled_bytes, size / sampled_bytes
+        )
+
+    def _sampled_chunks(self, sample_ratio: float = 1.0):
+        """Чанки файла; при sample_ratio < 1 - только равномерно выбранная доля блоков."""
+        if sample_ratio >= 1.0:
+            yield from self.file.read_chunks(RepeatFinder.BLOCK_SIZE)
+            return
+
+        with open(self.file.path, mode='rb') as f:
+            for offset in RepeatFinder.sample_offsets(self.file.get_size(), sample_ratio):
+                f.seek(offset)
+                yield offset, f.read(RepeatFinder.BLOCK_SIZE)
+
+    def _sampled_bytes(self, sample_ratio: float) -> int:
+        """Сколько байтов файла попадает в выборку _sampled_chunks."""
+        size = self.file.get_size()
+        return sum(
+            min(RepeatFinder.BLOCK_SIZE, size - offset)
+            for offset in RepeatFinder.sample_offsets(size, sample_ratio)
+        )
+
+    def carve(self, min_signature_length: int = 3, max_hits: int = 10000) -> Dict:
+        """
+        Поиск встроенных файлов по всем смещениям за один проход.
+        Короткие сигнатуры (BMP, MZ, MP3) принимаются только после проверки
+        заголовка (FileCarver.HEADER_CHECKS); прочие сигнатуры короче
+        min_signature_length пропускаются (слишком много ложных срабатываний).
+        Возвращает таблицу hits (offset, type, length, length_source:
+        'footer' / 'header' / 'estimate') и флаг truncated.
+        """
+        if not self.file.exists():
+            return {'error': 'Файл не найден'}
+
+        carver = FileCarver(self.FILE_SIGNATURES, min_signature_length, max_hits)
+        for offset, chunk in self.file.read_chunks(BinaryFile.BUFFER_SIZE):
+            carver.feed(offset, chunk)
+            if carver.truncated:
+                break
+
+        return {
+            'hits': carver.result(self.file.read_bytes),
+            'truncated': carver.truncated
+        }
+
+    def extract_carved(self, hits: List[Dict], output_dir: str) -> List[str]:
+        """Сохранение найденных вхождений в отдельные файлы каталога output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        with open(self.file.path, mode='rb') as src:
+            for hit in hits:
+                extension = FileCarver.EXTENSIONS.get(hit['type'], 'bin')
+                path = os.path.join(output_dir, f"{hit['offset']:010X}.{extension}")
+                src.seek(hit['offset'])
+                remaining = hit['length']
+                with open(path, mode='wb') as dst:
+                    while remaining > 0:
+                        data = src.read(min(remaining, BinaryFile.BUFFER_SIZE))
+                        if not data:
+                            break
+                        dst.write(data)
+                        remaining -= len(data)
+                paths.append(path)
+        return paths
+
+    def entropy_profile(self, block_size: int = 64 * 1024, workers: Optional[int] = None) -> Optional[EntropyProfile]:
+        """Энтропия по блокам block_size байт (для больших файлов - в нескольких процессах)."""
+        if not self.file.exists():
+            return None
+        return EntropyProfile.from_file(self.file.path, block_size, workers)
+
+    def write_report(self, report_path: str, encoding: str = 'utf-8', threaded: bool = False) -> Dict:
+        """
+        Запись отчета о бинарном файле (файл читается один раз).
+        Возвращает результат analyze_structure, посчитанный за тот же проход.
+        """
+        if self.file.exists():
+            results = self.build_pipeline(threaded=threaded).run(self.file.path)
+            analysis = self._structure(results)
+            patterns = results['patterns']
+            profile = results['entropy']
+            checksums = results['checksums']
+        else:
+            analysis = {'error': 'Файл не найден'}
 
         with open(report_path, mode='w', encoding=encoding) as report:
             report.write(f"=== Анализ бинарного файла ===\n")
@@ -179,10 +316,12 @@ class BinaryAnalyzer:
 
             if 'error' in analysis:
                 report.write(f"Ошибка: {analysis['error']}\n")
-                return
+                return analysis
 
             report.write(f"Тип файла: {analysis['file_type']}\n")
             report.write(f"Размер: {analysis['size']} байт\n")
+            for algorithm, digest in checksums.items():
+                report.write(f"{algorithm.upper()}: {digest}\n")
             report.write(f"Уникальных байтов: {analysis['unique_bytes']}/256\n")
             report.write(f"Энтропия: {analysis['entropy']:.4f}\n")
             report.write(f"Нулевых байтов: {analysis['null_bytes']} ({analysis['null_percentage']:.2f}%)\n\n")
@@ -196,8 +335,23 @@ class BinaryAnalyzer:
 
             if patterns:
                 report.write(f"\n=== Повторяющиеся паттерны ===\n")
+                if any(pattern.get('approximate') for pattern in patterns):
+                    report.write(
+                        "  (приближенно: '~' - оценка по выборке блоков файла "
+                        "или нижняя оценка после переполнения памяти)\n"
+                    )
                 for pattern in patterns[:10]:
+                    count = f"~{pattern['count']}" if pattern.get('approximate') else pattern['count']
                     report.write(
                         f"  Паттерн {pattern['pattern']} (длина {pattern['length']}): "
-                        f"{pattern['count']} раз, начиная с offset {pattern['first_offset']}\n"
-                    )
\ No newline at end of file
+                        f"{count} раз, начиная с offset {pattern['first_offset']}\n"
+                    )
+
+            if profile and profile.entropies:
+                report.write(f"\n=== Профиль энтропии (блоки по {profile.block_size} байт) ===\n")
+                report.write(f"  [{profile.sparkline()}]\n")
+                report.write(f"  Шкала: '{SPARK_CHARS[0]}' = 0 ... '{SPARK_CHARS[-1]}' = 8 бит/байт\n")
+                for offset, length in profile.high_entropy_regions()[:10]:
+                    report.write(f"  Высокая энтропия: offset {offset}, {length} байт\n")
+
+        return analysis
@@ -0,0 +1,271 @@
+import hashlib
+import struct
+import zlib
+from typing import Dict, Optional, Tuple, Union
+
+from .binary_file import BinaryFile
+
+
+# Модуль слабой (кольцевой) контрольной суммы, как в Adler-32
+_ADLER_MOD = 65521
+
+
+def _strong_hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class DeltaSignature:
+    """
+    Сигнатура старой версии файла: для каждого блока фиксированного размера
+    хранится слабая кольцевая сумма (Adler-32) и сильный хеш (BLAKE2b).
+    Сигнатуру можно сохранить в файл и передать на сторону с новой версией.
+    """
+
+    MAGIC = b'L1SIG001'
+
+    def __init__(self, block_size: int, old_size: int = 0):
+        self.block_size = block_size
+        self.old_size = old_size
+        self.blocks: Dict[int, Dict[bytes, int]] = {}
+        # Последний неполный блок не может совпасть с полным окном, храним отдельно
+        self.tail: Optional[Tuple[int, bytes, int]] = None
+
+    @classmethod
+    def from_file(cls, path: str, block_size: int) -> 'DeltaSignature':
+        signature = cls(block_size)
+        index = 0
+        with open(path, mode='rb') as f:
+            while block := f.read(block_size):
+                signature.add_block(index, block)
+                signature.old_size += len(block)
+                index += 1
+        return signature
+
+    def add_block(self, index: int, block: bytes) -> None:
+        if len(block) < self.block_size:
+            self.tail = (len(block), _strong_hash(block), index)
+            return
+        strong = _strong_hash(block)
+        self.blocks.setdefault(zlib.adler32(block), {}).setdefault(strong, index)
+
+    def save(self, path: str) -> None:
+        """Сохранение сигнатуры в компактном бинарном виде."""
+        with open(path, mode='wb') as f:
+            f.write(self.MAGIC + struct.pack('<IQ', self.block_size, self.old_size))
+            for weak, strongs in self.blocks.items():
+                for strong, index in strongs.items():
+                    f.write(struct.pack('<IQ', weak, index) + strong)
+            if self.tail:
+                length, strong, index = self.tail
+                f.write(struct.pack('<IQ', length, index | 1 << 63) + strong)
+
+    @classmethod
+    def load(cls, path: str) -> 'DeltaSignature':
+        with open(path, mode='rb') as f:
+            header = f.read(len(cls.MAGIC) + 12)
+            if not header.startswith(cls.MAGIC):
+                raise ValueError(f"Файл '{path}' не является сигнатурой.")
+            if len(header) != len(cls.MAGIC) + 12:
+                raise ValueError(f"Файл сигнатуры '{path}' поврежден.")
+            block_size, old_size = struct.unpack('<IQ', header[len(cls.MAGIC):])
+            signature = cls(block_size, old_size)
+            while record := f.read(28):
+                if len(record) != 28:
+                    raise ValueError(f"Файл сигнатуры '{path}' поврежден.")
+                weak, index = struct.unpack('<IQ', record[:12])
+                if index >> 63:
+                    signature.tail = (weak, record[12:], index & ~(1 << 63))
+                else:
+                    signature.blocks.setdefault(weak, {})[record[12:]] = index
+        return signature
+
+
+class BinaryDelta:
+    """
+    Бинарная дельта в стиле rsync.
+    Новая версия файла просматривается кольцевым окном размера блока: окно,
+    совпавшее с блоком старой версии, записывается командой копирования,
+    остальные байты - вставкой. Патч содержит только измененные данные.
+
+    Формат патча: MAGIC, размер блока, размер результата, затем команды
+    b'C' <номер блока> <число блоков> и b'I' <длина> <данные>,
+    завершающая команда b'E' <SHA-256 результата>.
+    """
+
+    MAGIC = b'L1DELTA1'
+    DEFAULT_BLOCK_SIZE = 4096
+    # Максимальный размер одной команды вставки
+    MAX_INSERT = 1024 * 1024
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+
+    def signature(self, old_path: str) -> DeltaSignature:
+        return DeltaSignature.from_file(old_path, self.block_size)
+
+    def create_patch(self, old: Union[str, DeltaSignature], new_path: str, patch_path: str) -> Dict:
+        """
+        Создание патча, превращающего старую версию в new_path.
+        old - путь к старому файлу или заранее посчитанная сигнатура.
+        """
+        signature = old if isinstance(old, DeltaSignature) else self.signature(old)
+        block_size = signature.block_size
+        blocks = signature.blocks
+        new_size = BinaryFile(new_path).get_size()
+        writer = _PatchWriter(patch_path, block_size, new_size, self.MAX_INSERT)
+
+        read_size = max(BinaryFile.BUFFER_SIZE, block_size * 2)
+        digest = hashlib.sha256()
+
+        with open(new_path, mode='rb') as f:
+            data = b''
+            eof = False
+            pos = 0          # начало текущего окна в data
+            literal = 0      # начало еще не записанных байтов вставки
+            weak = None      # слабая сумма окна data[pos:pos + block_size]
+
+            while True:
+                if len(data) - pos < block_size:
+                    if eof:
+                        break
+                    # Дочитываем файл, отбрасывая уже обработанный префикс буфера
+                    writer.insert(data[literal:pos])
+                    data = data[pos:]
+                    pos = literal = 0
+                    chunk = f.read(read_size)
+                    digest.update(chunk)
+                    eof = not chunk
+                    data += chunk
+                    weak = None
+                    continue
+
+                if weak is None:
+                    weak = zlib.adler32(data[pos:pos + block_size])
+
+                candidates = blocks.get(weak)
+                if candidates:
+                    index = candidates.get(_strong_hash(data[pos:pos + block_size]))
+                    if index is not None:
+                        writer.insert(data[literal:pos])
+                        writer.copy(index)
+                        pos += block_size
+                        literal = pos
+                        weak = None
+                        continue
+
+                if pos - literal >= self.MAX_INSERT:
+                    writer.insert(data[literal:pos])
+                    literal = pos
+
+                # Сдвиг окна на один байт с пересчетом слабой суммы
+                end = pos + block_size
+                if end >= len(data):
+                    pos += 1
+                    weak = None
+                    continue
+                out_byte = data[pos]
+                a = (weak & 0xFFFF) - out_byte + data[end]
+                a %= _ADLER_MOD
+                b = ((weak >> 16) - block_size * out_byte + a - 1) % _ADLER_MOD
+                weak = (b << 16) | a
+                pos += 1
+
+            # Хвост короче блока: может совпасть с последним неполным блоком старой версии
+            tail = data[literal:]
+            if tail and signature.tail and signature.tail[0] == len(tail) \
+                    and signature.tail[1] == _strong_hash(tail):
+                writer.copy(signature.tail[2])
+            else:
+                writer.insert(tail)
+
+        return writer.close(digest.digest())
+
+    @classmethod
+    def apply_patch(cls, old_path: str, patch_path: str, output_path: str) -> None:
+        """Восстановление новой версии файла из старой версии и патча."""
+        def read(size: int) -> bytes:
+            # Обрезанный патч не должен падать на struct.unpack
+            data = patch.read(size)
+            if len(data) != size:
+                raise ValueError(f"Патч '{patch_path}' поврежден.")
+            return data
+
+        with open(patch_path, mode='rb') as patch, \
+                open(old_path, mode='rb') as old, \
+                open(output_path, mode='wb') as out:
+            header = patch.read(len(cls.MAGIC) + 12)
+            if not header.startswith(cls.MAGIC):
+                raise ValueError(f"Файл '{patch_path}' не является патчем.")
+            if len(header) != len(cls.MAGIC) + 12:
+                raise ValueError(f"Патч '{patch_path}' поврежден.")
+            block_size, new_size = struct.unpack('<IQ', header[len(cls.MAGIC):])
+            digest = hashlib.sha256()
+
+            while True:
+                op = patch.read(1)
+                if op == b'C':
+                    index, count = struct.unpack('<QI', read(12))
+                    old.seek(index * block_size)
+                    remaining = count * block_size
+                    while remaining > 0:
+                        data = old.read(min(remaining, BinaryFile.BUFFER_SIZE))
+                        if not data:
+                            break
+                        out.write(data)
+                        digest.update(data)
+                        remaining -= len(data)
+                elif op == b'I':
+                    (length,) = struct.unpack('<I', read(4))
+                    data = read(length)
+                    out.write(data)
+                    digest.update(data)
+                elif op == b'E':
+                    expected = read(32)
+                    break
+                else:
+                    raise ValueError(f"Патч '{patch_path}' поврежден.")
+
+            if out.tell() != new_size or digest.digest() != expected:
+                raise ValueError("Результат применения патча не совпадает с исходным файлом "
+                                 "(патч создан для другой версии файла?).")
+
+
+class _PatchWriter:
+    """Запись команд патча с объединением соседних копирований."""
+
+    def __init__(self, path: str, block_size: int, new_size: int, max_insert: int):
+        self.file = open(path, mode='wb')
+        self.file.write(BinaryDelta.MAGIC + struct.pack('<IQ', block_size, new_size))
+        self.max_insert = max_insert
+        self.copy_start: Optional[int] = None
+        self.copy_count = 0
+        self.stats = {'copied_blocks': 0, 'inserted_bytes': 0}
+
+    def _flush_copy(self) -> None:
+        if self.copy_count:
+            self.file.write(b'C' + struct.pack('<QI', self.copy_start, self.copy_count))
+            self.copy_count = 0
+
+    def copy(self, index: int) -> None:
+        self.stats['copied_blocks'] += 1
+        if self.copy_count and self.copy_start + self.copy_count == index and self.copy_count < 0xFFFFFFFF:
+            self.copy_count += 1
+            return
+        self._flush_copy()
+        self.copy_start = index
+        self.copy_count = 1
+
+    def insert(self, data: bytes) -> None:
+        if not data:
+            return
+        self._flush_copy()
+        for i in range(0, len(data), self.max_insert):
+            part = data[i:i + self.max_insert]
+            self.file.write(b'I' + struct.pack('<I', len(part)) + part)
+        self.stats['inserted_bytes'] += len(data)
+
+    def close(self, digest: bytes) -> Dict:
+        self._flush_copy()
+        self.file.write(b'E' + digest)
+        self.file.close()
+        return self.stats
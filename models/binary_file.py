@@ -1,13 +1,32 @@
 import os
+import re
+import sys
+import time
+import errno
 import hashlib
-from typing import Generator, Optional, Tuple, Dict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Generator, Optional, Tuple, Dict, List
+
+from .aho_corasick import AhoCorasick
+from .byte_histogram import ByteHistogram
+from .checksum_cache import ChecksumCache
+from .byte_transforms import (
+    INVERT_TABLE, XOR_BLOCK_SIZE, TransformPipeline, XorKeystream, shift_table
+)
 
 
 class BinaryFile:
     """Класс для работы с бинарными файлами."""
 
-    def __init__(self, path: str):
+    # Размер буфера для потоковой обработки больших файлов
+    BUFFER_SIZE = 1024 * 1024
+    # Размер листового чанка для древовидного хеширования
+    TREE_CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, path: str, checksum_cache: Optional[ChecksumCache] = None):
         self.path = path
+        self.checksum_cache = checksum_cache
 
     def exists(self) -> bool:
         return os.path.isfile(self.path)
@@ -44,11 +63,126 @@ class BinaryFile:
 
     def calculate_checksum(self, algorithm: str = 'md5') -> str:
         """Вычисление контрольной суммы файла."""
-        hash_obj = hashlib.new(algorithm)
+        return self.calculate_checksums([algorithm])[algorithm]
+
+    def calculate_checksums(self, algorithms: List[str], threaded: bool = False) -> Dict[str, str]:
+        """
+        Вычисление нескольких контрольных сумм за одно чтение файла.
+        При threaded=True хешеры обновляются в отдельных потоках
+        (hashlib отпускает GIL на больших блоках), пока читается следующий блок.
+        Если задан checksum_cache, суммы сначала ищутся в кэше.
+        """
+        digests = {}
+        st = os.stat(self.path) if self.checksum_cache else None
+        if st is not None:
+            for algorithm in algorithms:
+                digest = self.checksum_cache.get(st, algorithm)
+                if digest is not None:
+                    digests[algorithm] = digest
+
+        hashers = {a: hashlib.new(a) for a in algorithms if a not in digests}
+        if not hashers:
+            return {algorithm: digests[algorithm] for algorithm in algorithms}
+
         with open(self.path, mode='rb') as f:
-            while chunk := f.read(8192):
-                hash_obj.update(chunk)
-        return hash_obj.hexdigest()
+            if not threaded or len(hashers) < 2:
+                while chunk := f.read(self.BUFFER_SIZE):
+                    for hash_obj in hashers.values():
+                        hash_obj.update(chunk)
+            else:
+                with ThreadPoolExecutor(max_workers=len(hashers)) as pool:
+                    pending = []
+                    while chunk := f.read(self.BUFFER_SIZE):
+                        # Хеширование предыдущего блока должно завершиться до обновления следующим
+                        for future in pending:
+                            future.result()
+                        pending = [pool.submit(h.update, chunk) for h in hashers.values()]
+                    for future in pending:
+                        future.result()
+
+        for algorithm, hash_obj in hashers.items():
+            digests[algorithm] = hash_obj.hexdigest()
+
+        # Файл, изменившийся во время хеширования, в кэш не попадает
+        if st is not None and self._same_stat(st, os.stat(self.path)):
+            for algorithm in hashers:
+                self.checksum_cache.put(st, algorithm, digests[algorithm])
+
+        return {algorithm: digests[algorithm] for algorithm in algorithms}
+
+    @staticmethod
+    def _same_stat(a: os.stat_result, b: os.stat_result) -> bool:
+        return (a.st_dev, a.st_ino, a.st_size, a.st_mtime_ns) == (b.st_dev, b.st_ino, b.st_size, b.st_mtime_ns)
+
+    def _hash_chunk(self, algorithm: str, offset: int, size: int) -> bytes:
+        """
+        Хеш листа дерева: H(0x00 || данные чанка).
+        Каждый чанк читается через свой объект файла: позиция не разделяется
+        между потоками (на Windows нет os.pread, а dup-дескриптор делит позицию).
+        """
+        hash_obj = hashlib.new(algorithm, b'\x00')
+        with open(self.path, mode='rb') as f:
+            f.seek(offset)
+            remaining = size
+            while remaining > 0:
+                data = f.read(min(self.BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                hash_obj.update(data)
+                remaining -= len(data)
+        return hash_obj.digest()
+
+    def chunk_digests(self, algorithm: str = 'sha256', chunk_size: Optional[int] = None,
+                      workers: Optional[int] = None, indices: Optional[List[int]] = None) -> List[bytes]:
+        """
+        Параллельное хеширование фиксированных чанков файла.
+        indices позволяет посчитать только выбранные чанки.
+        """
+        chunk_size = chunk_size or self.TREE_CHUNK_SIZE
+        size = self.get_size()
+        count = max(1, -(-size // chunk_size))
+        if indices is None:
+            indices = range(count)
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            return list(pool.map(
+                lambda i: self._hash_chunk(algorithm, i * chunk_size, chunk_size),
+                indices
+            ))
+
+    def calculate_tree_hash(self, algorithm: str = 'sha256', chunk_size: Optional[int] = None,
+                            workers: Optional[int] = None, include_chunks: bool = False) -> Dict:
+        """
+        Древовидный (Merkle) хеш файла.
+        Чанки хешируются параллельно, корень строится из их хешей.
+        Хеши чанков (include_chunks=True) позволяют позже найти поврежденный чанк.
+        """
+        chunk_size = chunk_size or self.TREE_CHUNK_SIZE
+        digests = self.chunk_digests(algorithm, chunk_size, workers)
+        result = {
+            'algorithm': algorithm,
+            'chunk_size': chunk_size,
+            'size': self.get_size(),
+            'root': _merkle_root(digests, algorithm).hex()
+        }
+        if include_chunks:
+            result['chunks'] = [digest.hex() for digest in digests]
+        return result
+
+    def verify_tree_hash(self, tree: Dict, workers: Optional[int] = None) -> Dict:
+        """Проверка файла по результату calculate_tree_hash(include_chunks=True)."""
+        digests = self.chunk_digests(tree['algorithm'], tree['chunk_size'], workers)
+        expected = tree['chunks']
+        damaged = [
+            i for i in range(max(len(digests), len(expected)))
+            if i >= len(digests) or i >= len(expected) or digests[i].hex() != expected[i]
+        ]
+        return {
+            'valid': not damaged and _merkle_root(digests, tree['algorithm']).hex() == tree['root'],
+            'damaged_chunks': damaged,
+            'size': self.get_size(),
+            'expected_size': tree['size']
+        }
 
     def read_chunks(self, chunk_size: int = 16) -> Generator[Tuple[int, bytes], None, None]:
         """Чтение файла по чанкам с указанием смещения."""
@@ -58,78 +192,223 @@ class BinaryFile:
                 yield (offset, chunk)
                 offset += len(chunk)
 
+    def iter_find_bytes(self, pattern: bytes, start: int = 0,
+                        chunk_size: Optional[int] = None) -> Generator[int, None, None]:
+        """
+        Ленивый поиск байтовой последовательности.
+        Файл читается перекрывающимися чанками, поэтому совпадения на границе
+        чанков не теряются, а память не зависит от размера файла.
+        """
+        if not pattern:
+            return
+        chunk_size = max(chunk_size or self.BUFFER_SIZE, len(pattern))
+        overlap = len(pattern) - 1
+
+        with open(self.path, mode='rb') as f:
+            f.seek(start)
+            tail = b''
+            base = start  # смещение начала tail в файле
+            while chunk := f.read(chunk_size):
+                data = tail + chunk if tail else chunk
+                idx = data.find(pattern)
+                while idx != -1:
+                    yield base + idx
+                    idx = data.find(pattern, idx + 1)
+
+                # Хвост короче паттерна, поэтому совпадения в нём не повторятся
+                keep = min(overlap, len(data))
+                tail = data[len(data) - keep:] if keep else b''
+                base += len(data) - keep
+
+    def rfind_bytes(self, pattern: bytes, end: Optional[int] = None,
+                    chunk_size: Optional[int] = None) -> Optional[int]:
+        """
+        Поиск последнего вхождения, начинающегося до смещения end.
+        Файл читается чанками с конца (pread) с перекрытием на длину паттерна.
+        """
+        if not pattern:
+            return None
+        overlap = len(pattern) - 1
+        chunk_size = max(chunk_size or self.BUFFER_SIZE, 2 * len(pattern))
+
+        fd = os.open(self.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            size = os.fstat(fd).st_size
+            # Совпадение, начинающееся до end, заканчивается не дальше end + overlap
+            hi = size if end is None else min(size, max(0, end) + overlap)
+            while hi >= len(pattern):
+                lo = max(0, hi - chunk_size)
+                idx = _pread(fd, hi - lo, lo).rfind(pattern)
+                if idx != -1:
+                    return lo + idx
+                if lo == 0:
+                    break
+                hi = lo + overlap
+        finally:
+            os.close(fd)
+        return None
+
     def find_bytes(self, pattern: bytes, max_results: int = -1) -> list:
         """Поиск байтовой последовательности в файле."""
-        results = []
-        data = self.read_bytes()
-        start = 0
-        while True:
-            idx = data.find(pattern, start)
-            if idx == -1:
-                break
-            results.append(idx)
-            if max_results > 0 and len(results) >= max_results:
-                break
-            start = idx + 1
+        offsets = self.iter_find_bytes(pattern)
+        if max_results > 0:
+            offsets = islice(offsets, max_results)
+        return list(offsets)
+
+    def iter_find_many(self, patterns: List[bytes],
+                       max_results: int = -1) -> Generator[Tuple[bytes, int], None, None]:
+        """
+        Поиск нескольких байтовых последовательностей за один проход по файлу.
+        Возвращает пары (паттерн, смещение); max_results ограничивает
+        количество результатов для каждого паттерна отдельно.
+        """
+        matcher = AhoCorasick(patterns)
+        counts = [0] * len(matcher.patterns)
+        exhausted = 0
+
+        chunks = (chunk for _, chunk in self.read_chunks(self.BUFFER_SIZE))
+        for idx, offset in matcher.iter_matches(chunks):
+            if max_results > 0:
+                if counts[idx] >= max_results:
+                    continue
+                counts[idx] += 1
+                if counts[idx] == max_results:
+                    exhausted += 1
+            yield matcher.patterns[idx], offset
+            # Все паттерны набрали лимит - дальше файл читать не нужно
+            if exhausted == len(counts):
+                return
+
+    def find_many(self, patterns: List[bytes], max_results: int = -1) -> Dict[bytes, list]:
+        """Поиск нескольких байтовых последовательностей с группировкой по паттерну."""
+        results = {pattern: [] for pattern in patterns}
+        for pattern, offset in self.iter_find_many(patterns, max_results):
+            results[pattern].append(offset)
         return results
 
     def get_file_signature(self) -> bytes:
         """Получение первых байтов файла (сигнатура)."""
         return self.read_bytes(0, 16)
 
+    def get_byte_histogram(self) -> ByteHistogram:
+        """Потоковый подсчет гистограммы байтов за один проход."""
+        histogram = ByteHistogram()
+        for _, chunk in self.read_chunks(self.BUFFER_SIZE):
+            histogram.update(chunk)
+        return histogram
+
     def get_byte_distribution(self) -> Dict[int, int]:
         """Получение распределения байтов в файле."""
-        distribution = {i: 0 for i in range(256)}
-        data = self.read_bytes()
-        for byte in data:
-            distribution[byte] += 1
-        return distribution
+        return self.get_byte_histogram().to_dict()
 
-    def xor_encrypt_decrypt(self, key: bytes, output_path: str) -> None:
-        """XOR шифрование/дешифрование."""
-        key_len = len(key)
+    def _transform_to(self, output_path: str, transform: Callable[[bytes, int], bytes],
+                      buffer_size: Optional[int] = None) -> None:
+        """
+        Потоковое преобразование файла в output_path.
+        transform получает блок и его смещение в файле и возвращает новый блок.
+        """
+        buffer = bytearray(buffer_size or self.BUFFER_SIZE)
+        offset = 0
         with open(self.path, mode='rb') as src:
             with open(output_path, mode='wb') as dst:
-                idx = 0
-                while chunk := src.read(8192):
-                    encrypted = bytearray()
-                    for byte in chunk:
-                        encrypted.append(byte ^ key[idx % key_len])
-                        idx += 1
-                    dst.write(bytes(encrypted))
+                while size := src.readinto(buffer):
+                    block = buffer if size == len(buffer) else buffer[:size]
+                    dst.write(transform(block, offset))
+                    offset += size
+
+    def xor_encrypt_decrypt(self, key: bytes, output_path: str) -> None:
+        """XOR шифрование/дешифрование."""
+        # Размер буфера кратен длине ключа, чтобы фаза ключа не сдвигалась между блоками
+        key_len = len(key) or 1
+        buffer_size = max(XOR_BLOCK_SIZE - XOR_BLOCK_SIZE % key_len, key_len)
+        keystream = XorKeystream(key, buffer_size)
+        self._transform_to(output_path, keystream.apply, buffer_size)
 
     def shift_bytes(self, shift: int, output_path: str) -> None:
         """Сдвиг байтов (Caesar cipher для байтов)."""
-        with open(self.path, mode='rb') as src:
-            with open(output_path, mode='wb') as dst:
-                while chunk := src.read(8192):
-                    shifted = bytes([(byte + shift) % 256 for byte in chunk])
-                    dst.write(shifted)
+        table = shift_table(shift)
+        self._transform_to(output_path, lambda block, _: block.translate(table))
 
     def invert_bytes(self, output_path: str) -> None:
         """Инвертирование всех байтов (NOT operation)."""
-        with open(self.path, mode='rb') as src:
-            with open(output_path, mode='wb') as dst:
-                while chunk := src.read(8192):
-                    inverted = bytes([~byte & 0xFF for byte in chunk])
-                    dst.write(inverted)
+        self._transform_to(output_path, lambda block, _: block.translate(INVERT_TABLE))
+
+    def apply_pipeline(self, pipeline: TransformPipeline, output_path: str) -> None:
+        """Применение цепочки преобразований за одно чтение файла."""
+        block_size = pipeline.block_size()
+        self._transform_to(output_path, pipeline.build(block_size), block_size)
+
+    def iter_data_extents(self) -> Generator[Tuple[int, int], None, None]:
+        """
+        Диапазоны [start, end) файла, в которых есть данные.
+        Дыры разреженного файла (SEEK_HOLE) пропускаются; если файловая
+        система этого не поддерживает, весь файл - один диапазон.
+        """
+        size = self.get_size()
+        if size == 0:
+            return
+        if not hasattr(os, 'SEEK_DATA'):
+            yield (0, size)
+            return
 
-    def copy_to(self, dst_path: str, callback=None) -> None:
-        """Побайтовое копирование с возможностью отслеживания прогресса."""
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            offset = 0
+            while offset < size:
+                try:
+                    start = os.lseek(fd, offset, os.SEEK_DATA)
+                except OSError as e:
+                    if e.errno == errno.ENXIO:
+                        # Дальше только дыра до конца файла
+                        return
+                    if offset == 0:
+                        yield (0, size)
+                        return
+                    raise
+                end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+                yield (start, end)
+                offset = end
+        finally:
+            os.close(fd)
+
+    def copy_to(self, dst_path: str, callback=None, progress_interval: float = 0.1,
+                sparse: bool = True) -> None:
+        """
+        Копирование с возможностью отслеживания прогресса.
+        На Linux данные копирует ядро (copy_file_range / sendfile), иначе -
+        readinto в переиспользуемый буфер. callback вызывается не чаще,
+        чем раз в progress_interval секунд, и обязательно в конце.
+        При sparse=True копируются только области с данными, а дыры
+        исходного файла остаются дырами в копии.
+        """
         total_size = self.get_size()
-        copied = 0
-        chunk_size = 8192
+        progress = _ThrottledProgress(callback, total_size, progress_interval)
+        extents = list(self.iter_data_extents()) if sparse else [(0, total_size)]
+        buffer = bytearray(self.BUFFER_SIZE)
 
-        with open(self.path, mode='rb') as src:
-            with open(dst_path, mode='wb') as dst:
-                while chunk := src.read(chunk_size):
-                    dst.write(chunk)
-                    copied += len(chunk)
-                    if callback:
-                        callback(copied, total_size)
-
-    def compare_with(self, other_path: str) -> Dict:
-        """Сравнение двух файлов побайтово."""
+        with open(self.path, mode='rb', buffering=0) as src:
+            with open(dst_path, mode='wb', buffering=0) as dst:
+                if extents == [(0, total_size)]:
+                    # Обычный файл: копируем до конца, даже если он успел вырасти
+                    copied = _copy_range(src, dst, None, buffer, progress, 0)
+                else:
+                    for start, end in extents:
+                        src.seek(start)
+                        dst.seek(start)
+                        _copy_range(src, dst, end - start, buffer, progress, start)
+                    # Хвостовая дыра и размер файла задаются без записи нулей
+                    dst.truncate(total_size)
+                    copied = total_size
+
+        progress.finish(copied)
+
+    def compare_with(self, other_path: str, max_ranges: int = 1000, max_differences: int = 100) -> Dict:
+        """
+        Сравнение двух файлов.
+        Чанки сначала сравниваются целиком; только несовпавшие чанки
+        разбираются на диапазоны различий. Файлы разной длины сравниваются
+        по общей части, а лишний хвост указывается отдельно.
+        """
         other_file = BinaryFile(other_path)
 
         if not other_file.exists():
@@ -137,47 +416,85 @@ class BinaryFile:
 
         size1 = self.get_size()
         size2 = other_file.get_size()
+        common = min(size1, size2)
 
-        if size1 != size2:
-            return {
-                'equal': False,
-                'reason': 'Разные размеры',
-                'size1': size1,
-                'size2': size2
-            }
+        diff_ranges = []
+        truncated = False
 
-        differences = []
-        chunk_size = 8192
+        # Там, где дыры в обоих файлах, данные заведомо совпадают (нули)
+        ranges = _merge_extents(self.iter_data_extents(), other_file.iter_data_extents())
 
         with open(self.path, mode='rb') as f1:
             with open(other_path, mode='rb') as f2:
-                offset = 0
-                while True:
-                    chunk1 = f1.read(chunk_size)
-                    chunk2 = f2.read(chunk_size)
+                for start, end in ranges:
+                    end = min(end, common)
+                    if start >= end:
+                        continue
+                    f1.seek(start)
+                    f2.seek(start)
+                    offset = start
+                    while offset < end and not truncated:
+                        size = min(self.BUFFER_SIZE, end - offset)
+                        chunk1 = f1.read(size)
+                        chunk2 = f2.read(size)
+                        if not chunk1 or not chunk2:
+                            break
 
-                    if not chunk1:
-                        break
+                        if chunk1 != chunk2:
+                            for diff_start, diff_end in _diff_runs(chunk1, chunk2):
+                                diff_start += offset
+                                diff_end += offset
+                                if diff_ranges and diff_ranges[-1][1] == diff_start:
+                                    # Различие продолжается через границу чанков
+                                    diff_ranges[-1] = (diff_ranges[-1][0], diff_end)
+                                elif len(diff_ranges) >= max_ranges:
+                                    truncated = True
+                                    break
+                                else:
+                                    diff_ranges.append((diff_start, diff_end))
 
-                    for i in range(len(chunk1)):
-                        if chunk1[i] != chunk2[i]:
-                            differences.append({
-                                'offset': offset + i,
-                                'byte1': chunk1[i],
-                                'byte2': chunk2[i]
-                            })
-                            if len(differences) >= 100:  # Ограничение
-                                break
-
-                    offset += len(chunk1)
-                    if len(differences) >= 100:
+                        offset += len(chunk1)
+                    if truncated:
                         break
 
-        return {
-            'equal': len(differences) == 0,
+                differences = self._first_differences(f1, f2, diff_ranges, max_differences)
+
+        result = {
+            'equal': not diff_ranges and size1 == size2,
+            'size1': size1,
+            'size2': size2,
             'differences': differences,
-            'total_checked': size1
+            'diff_ranges': [{'offset': start, 'length': end - start} for start, end in diff_ranges],
+            'truncated': truncated,
+            'tail': None,
+            'total_checked': common
         }
+        if size1 != size2:
+            result['reason'] = 'Разные размеры'
+            result['tail'] = {
+                'offset': common,
+                'length': abs(size1 - size2),
+                'file': 1 if size1 > size2 else 2
+            }
+        elif diff_ranges:
+            result['reason'] = 'Найдены различия'
+        return result
+
+    @staticmethod
+    def _first_differences(f1, f2, diff_ranges: List[Tuple[int, int]], limit: int) -> List[Dict]:
+        """Побайтовое описание первых различий по найденным диапазонам."""
+        differences = []
+        for start, end in diff_ranges:
+            size = min(end - start, limit - len(differences))
+            if size <= 0:
+                break
+            f1.seek(start)
+            f2.seek(start)
+            chunk1 = f1.read(size)
+            chunk2 = f2.read(size)
+            for i in range(size):
+                differences.append({'offset': start + i, 'byte1': chunk1[i], 'byte2': chunk2[i]})
+        return differences
 
     def rename(self, new_path: str) -> None:
         """Переименование файла."""
@@ -187,4 +504,135 @@ class BinaryFile:
     def delete(self) -> None:
         """Удаление файла."""
         if self.exists():
-            os.remove(self.path)
\ No newline at end of file
+            os.remove(self.path)
+
+
+def _pread(fd: int, size: int, offset: int) -> bytes:
+    """
+    Чтение по смещению (os.pread не меняет позицию файла).
+    На Windows os.pread нет, а dup-дескриптор делит позицию с исходным,
+    поэтому для чтения из нескольких потоков эта функция не подходит.
+    """
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    # Windows: os.pread недоступен, читаем через копию дескриптора
+    with open(os.dup(fd), mode='rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def _merkle_root(digests: List[bytes], algorithm: str) -> bytes:
+    """Корень дерева Меркла: узел = H(0x01 || левый || правый), нечетный узел поднимается выше."""
+    level = list(digests)
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level) - 1, 2):
+            next_level.append(hashlib.new(algorithm, b'\x01' + level[i] + level[i + 1]).digest())
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+    return level[0]
+
+
+_DIFF_RUN = re.compile(rb'[^\x00]+')
+
+
+def _diff_runs(chunk1: bytes, chunk2: bytes) -> Generator[Tuple[int, int], None, None]:
+    """
+    Диапазоны [start, end) различающихся байтов двух чанков одинаковой длины.
+    XOR выполняется над чанками как над большими целыми числами: в результате
+    нулевые байты соответствуют совпадениям, а серии ненулевых ищет re.
+    """
+    size = min(len(chunk1), len(chunk2))
+    xored = (int.from_bytes(chunk1[:size], 'big') ^ int.from_bytes(chunk2[:size], 'big')).to_bytes(size, 'big')
+    for match in _DIFF_RUN.finditer(xored):
+        yield match.span()
+
+
+def _merge_extents(*extent_lists) -> List[Tuple[int, int]]:
+    """Объединение нескольких наборов диапазонов [start, end) в отсортированный список."""
+    merged = []
+    for start, end in sorted(extent for extents in extent_lists for extent in extents):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# Ошибки, означающие, что системный вызов копирования не поддерживается для этих файлов
+_COPY_UNSUPPORTED = {
+    getattr(errno, name) for name in ('ENOSYS', 'EXDEV', 'EINVAL', 'EOPNOTSUPP', 'ENOTSUP', 'EBADF')
+    if hasattr(errno, name)
+}
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, length: Optional[int], progress: '_ThrottledProgress',
+                 position: int, chunk_size: int = 16 * 1024 * 1024) -> int:
+    """
+    Копирование средствами ядра без передачи данных через Python.
+    Копирует length байтов (None - до конца файла) с текущих позиций
+    и возвращает количество скопированных байтов; если системные вызовы
+    недоступны, копирование дописывает вызывающий код.
+    """
+    methods = []
+    if hasattr(os, 'copy_file_range'):
+        methods.append(lambda count: os.copy_file_range(src_fd, dst_fd, count))
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        methods.append(lambda count: os.sendfile(dst_fd, src_fd, None, count))
+
+    copied = 0
+    for method in methods:
+        try:
+            while length is None or copied < length:
+                count = chunk_size if length is None else min(chunk_size, length - copied)
+                size = method(count)
+                if not size:
+                    break
+                copied += size
+                progress.update(position + copied)
+            return copied
+        except OSError as e:
+            if e.errno not in _COPY_UNSUPPORTED:
+                raise
+    return copied
+
+
+def _copy_range(src, dst, length: Optional[int], buffer: bytearray,
+                progress: '_ThrottledProgress', position: int) -> int:
+    """Копирование length байтов (None - до конца) между небуферизованными файлами."""
+    copied = _kernel_copy(src.fileno(), dst.fileno(), length, progress, position)
+
+    # Запасной путь: обычное чтение/запись с текущих позиций
+    view = memoryview(buffer)
+    while length is None or copied < length:
+        limit = len(buffer) if length is None else min(len(buffer), length - copied)
+        size = src.readinto(view[:limit])
+        if not size:
+            break
+        dst.write(view[:size])
+        copied += size
+        progress.update(position + copied)
+    return copied
+
+
+class _ThrottledProgress:
+    """Вызов callback прогресса не чаще заданного интервала."""
+
+    def __init__(self, callback, total: int, interval: float):
+        self.callback = callback
+        self.total = total
+        self.interval = interval
+        self._last_call = time.monotonic()
+
+    def update(self, copied: int) -> None:
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if now - self._last_call >= self.interval:
+            self._last_call = now
+            self.callback(copied, self.total)
+
+    def finish(self, copied: int) -> None:
+        if self.callback is not None:
+            self.callback(copied, self.total)
@@ -0,0 +1,58 @@
+import math
+from collections import Counter
+from heapq import nlargest
+from typing import Dict, List, Tuple
+
+
+class ByteHistogram:
+    """
+    Гистограмма байтов на 256 ячеек, накапливаемая по чанкам.
+    Все статистики (энтропия, уникальные байты, доля нулей, топ байтов)
+    считаются по уже собранной гистограмме без повторного чтения файла.
+    """
+
+    def __init__(self):
+        self.counts: List[int] = [0] * 256
+        self.total = 0
+
+    def update(self, chunk: bytes) -> None:
+        """Добавление чанка в гистограмму."""
+        counts = self.counts
+        for byte, count in Counter(chunk).items():
+            counts[byte] += count
+        self.total += len(chunk)
+
+    def merge(self, other: 'ByteHistogram') -> None:
+        """Объединение с другой гистограммой."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def entropy(self) -> float:
+        """Энтропия по формуле Шеннона (бит на байт)."""
+        return entropy_of(self.counts, self.total)
+
+    def unique_bytes(self) -> int:
+        return sum(1 for count in self.counts if count > 0)
+
+    def null_ratio(self) -> float:
+        return self.counts[0] / self.total if self.total > 0 else 0.0
+
+    def most_common(self, n: int = 10) -> List[Tuple[int, int]]:
+        """Наиболее частые байты в виде пар (байт, количество)."""
+        present = ((byte, count) for byte, count in enumerate(self.counts) if count > 0)
+        return nlargest(n, present, key=lambda x: x[1])
+
+    def to_dict(self) -> Dict[int, int]:
+        return dict(enumerate(self.counts))
+
+
+def entropy_of(counts: List[int], total: int) -> float:
+    """Энтропия Шеннона для набора частот."""
+    if total <= 0:
+        return 0.0
+    entropy = 0.0
+    for count in counts:
+        if count > 0:
+            probability = count / total
+            entropy -= probability * math.log2(probability)
+    return entropy
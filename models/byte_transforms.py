@@ -0,0 +1,142 @@
+from math import lcm
+from typing import Callable, List, Optional, Tuple
+
+
+# Для XOR через большие целые числа блоки порядка 64 КБ обрабатываются
+# быстрее, чем мегабайтные: операнды остаются в кэше процессора
+XOR_BLOCK_SIZE = 64 * 1024
+
+# Таблица для bytes.translate: инвертирование (NOT) каждого байта
+INVERT_TABLE = bytes(~byte & 0xFF for byte in range(256))
+
+# Таблица для bytes.translate: печатаемые ASCII остаются, остальные байты -> '.'
+ASCII_TABLE = bytes(b if 32 <= b <= 126 else ord('.') for b in range(256))
+
+
+def shift_table(shift: int) -> bytes:
+    """Таблица для bytes.translate: циклический сдвиг байтов на shift."""
+    return bytes((byte + shift) % 256 for byte in range(256))
+
+
+class XorKeystream:
+    """
+    XOR данных с циклически повторяющимся ключом.
+    Ключ разворачивается в поток нужной длины, а XOR выполняется
+    над блоком целиком как над одним большим целым числом.
+    """
+
+    def __init__(self, key: bytes, block_size: int):
+        if not key:
+            raise ValueError("Ключ не может быть пустым.")
+        self.key = key
+        self.block_size = block_size
+        self._stream = key * (block_size // len(key) + 2)
+        self._cached_phase: Optional[int] = None
+        self._cached_int = 0
+
+    def _keystream_int(self, phase: int, size: int) -> int:
+        """Поток ключа длины size, начиная с позиции phase ключа."""
+        if size == self.block_size:
+            if self._cached_phase != phase:
+                self._cached_int = int.from_bytes(self._stream[phase:phase + size], 'little')
+                self._cached_phase = phase
+            return self._cached_int
+        return int.from_bytes(self._stream[phase:phase + size], 'little')
+
+    def apply(self, data: bytes, offset: int) -> bytes:
+        """XOR блока data, который начинается со смещения offset в потоке."""
+        size = len(data)
+        if size > self.block_size:
+            # Блоки больше расчетного обрабатываем по частям
+            return b''.join(
+                self.apply(data[i:i + self.block_size], offset + i)
+                for i in range(0, size, self.block_size)
+            )
+        phase = offset % len(self.key)
+        value = int.from_bytes(data, 'little') ^ self._keystream_int(phase, size)
+        return value.to_bytes(size, 'little')
+
+
+class TransformPipeline:
+    """
+    Цепочка байтовых преобразований, применяемая за один проход.
+    Подряд идущие табличные шаги (сдвиг, инвертирование, XOR с однобайтовым
+    ключом, пользовательская таблица) сворачиваются в одну таблицу на 256 байт,
+    подряд идущие XOR с многобайтовыми ключами - в один ключ.
+    """
+
+    # Ограничение длины объединенного ключа XOR (НОК длин ключей)
+    MAX_FUSED_KEY = 64 * 1024
+
+    def __init__(self):
+        self.steps: List[Tuple[str, bytes]] = []
+
+    def xor(self, key: bytes) -> 'TransformPipeline':
+        if not key:
+            raise ValueError("Ключ не может быть пустым.")
+        self.steps.append(('xor', key))
+        return self
+
+    def shift(self, shift: int) -> 'TransformPipeline':
+        self.steps.append(('table', shift_table(shift)))
+        return self
+
+    def invert(self) -> 'TransformPipeline':
+        self.steps.append(('table', INVERT_TABLE))
+        return self
+
+    def table(self, table: bytes) -> 'TransformPipeline':
+        if len(table) != 256:
+            raise ValueError("Таблица замены должна содержать ровно 256 байт.")
+        self.steps.append(('table', bytes(table)))
+        return self
+
+    def compile(self) -> List[Tuple[str, bytes]]:
+        """Свертка шагов в минимальный список стадий."""
+        stages: List[Tuple[str, bytes]] = []
+        for kind, value in self.steps:
+            # XOR с ключом из одинаковых байтов не зависит от позиции
+            if kind == 'xor' and value.count(value[0]) == len(value):
+                kind, value = 'table', bytes(b ^ value[0] for b in range(256))
+
+            if stages and stages[-1][0] == kind == 'table':
+                stages[-1] = ('table', stages[-1][1].translate(value))
+            elif stages and stages[-1][0] == kind == 'xor':
+                prev = stages[-1][1]
+                length = lcm(len(prev), len(value))
+                if length > self.MAX_FUSED_KEY:
+                    stages.append((kind, value))
+                    continue
+                fused = (int.from_bytes(prev * (length // len(prev)), 'little')
+                         ^ int.from_bytes(value * (length // len(value)), 'little'))
+                stages[-1] = ('xor', fused.to_bytes(length, 'little'))
+            else:
+                stages.append((kind, value))
+        return stages
+
+    def block_size(self) -> int:
+        """Размер блока, при котором фаза всех ключей XOR не сдвигается."""
+        length = 1
+        for kind, value in self.compile():
+            if kind == 'xor':
+                length = lcm(length, len(value))
+        if length > XOR_BLOCK_SIZE:
+            return XOR_BLOCK_SIZE
+        return XOR_BLOCK_SIZE - XOR_BLOCK_SIZE % length
+
+    def build(self, block_size: Optional[int] = None) -> Callable[[bytes, int], bytes]:
+        """Функция (блок, смещение) -> блок, применяющая всю цепочку."""
+        block_size = block_size or self.block_size()
+        stages = []
+        for kind, value in self.compile():
+            if kind == 'table':
+                stages.append(lambda block, _, table=value: block.translate(table))
+            else:
+                stages.append(XorKeystream(value, block_size).apply)
+
+        def apply(block: bytes, offset: int) -> bytes:
+            for stage in stages:
+                block = stage(block, offset)
+            return bytes(block)
+
+        return apply
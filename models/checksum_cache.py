@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+
+
+class ChecksumCache:
+    """
+    Постоянный кэш контрольных сумм в SQLite.
+    Запись привязана к (устройство, inode, размер, mtime_ns, алгоритм):
+    при изменении файла размер или время модификации меняются и запись
+    считается устаревшей. Размер кэша ограничен, вытесняются давно
+    не использованные записи (LRU).
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.lab1_checksums.sqlite')
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000):
+        self.path = path or self.DEFAULT_PATH
+        self.max_entries = max_entries
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS checksums ("
+                " device INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " algorithm TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " digest TEXT NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (device, inode, algorithm))"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS checksums_last_used ON checksums (last_used)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get(self, st: os.stat_result, algorithm: str) -> Optional[str]:
+        """Поиск контрольной суммы для файла с указанным stat."""
+        try:
+            connection = self._connect()
+            with connection:
+                row = connection.execute(
+                    "SELECT size, mtime_ns, digest FROM checksums"
+                    " WHERE device = ? AND inode = ? AND algorithm = ?",
+                    (st.st_dev, st.st_ino, algorithm)
+                ).fetchone()
+                if row is None:
+                    return None
+                if (row[0], row[1]) != (st.st_size, st.st_mtime_ns):
+                    # Файл изменился - запись устарела
+                    connection.execute(
+                        "DELETE FROM checksums WHERE device = ? AND inode = ? AND algorithm = ?",
+                        (st.st_dev, st.st_ino, algorithm)
+                    )
+                    return None
+                connection.execute(
+                    "UPDATE checksums SET last_used = ?"
+                    " WHERE device = ? AND inode = ? AND algorithm = ?",
+                    (time.time(), st.st_dev, st.st_ino, algorithm)
+                )
+                return row[2]
+        except sqlite3.Error:
+            # Кэш - только оптимизация: при ошибке базы считаем, что записи нет
+            return None
+
+    def put(self, st: os.stat_result, algorithm: str, digest: str) -> None:
+        """Сохранение контрольной суммы с вытеснением старых записей."""
+        try:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO checksums"
+                    " (device, inode, algorithm, size, mtime_ns, digest, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (st.st_dev, st.st_ino, algorithm, st.st_size, st.st_mtime_ns,
+                     digest, time.time())
+                )
+                connection.execute(
+                    "DELETE FROM checksums WHERE rowid IN ("
+                    " SELECT rowid FROM checksums ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        """Удаление всех записей кэша."""
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM checksums")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
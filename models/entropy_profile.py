@@ -0,0 +1,134 @@
+import csv
+import json
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .parallel_ranges import RANGES_PER_WORKER, pool_size, split_bounds
+
+
+# Шкала яркости для ASCII-спарклайна: от низкой энтропии к высокой
+SPARK_CHARS = ' .:-=+*#%@'
+
+
+def block_entropy(block: bytes) -> float:
+    """
+    Энтропия блока (бит на байт).
+    Гистограмма считается Counter на уровне C, формула переписана как
+    log2(n) - sum(c * log2(c)) / n - цикл только по встреченным байтам.
+    """
+    size = len(block)
+    if size == 0:
+        return 0.0
+    weighted = sum(count * math.log2(count) for count in Counter(block).values())
+    return max(0.0, math.log2(size) - weighted / size)
+
+
+def _range_entropies(path: str, start: int, end: int, block_size: int) -> List[float]:
+    """Энтропии блоков в диапазоне [start, end) файла (выполняется в отдельном процессе)."""
+    entropies = []
+    with open(path, mode='rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            entropies.append(block_entropy(block))
+            remaining -= len(block)
+    return entropies
+
+
+class EntropyProfile:
+    """
+    Профиль энтропии файла по блокам фиксированного размера.
+    Позволяет найти сжатые или зашифрованные области внутри больших образов,
+    где общая энтропия файла ничего не говорит.
+    """
+
+    def __init__(self, block_size: int, size: int = 0, entropies: Optional[List[float]] = None):
+        self.block_size = block_size
+        self.size = size
+        self.entropies: List[float] = entropies or []
+
+    @classmethod
+    def from_file(cls, path: str, block_size: int = 64 * 1024, workers: Optional[int] = None) -> 'EntropyProfile':
+        """
+        Расчет профиля. Файл делится на диапазоны из целых блоков,
+        диапазоны обрабатываются параллельно в пуле процессов.
+        """
+        if block_size <= 0:
+            raise ValueError("Размер блока должен быть положительным.")
+
+        size = os.path.getsize(path)
+        workers = pool_size(size, workers)
+        if workers == 1:
+            return cls(block_size, size, _range_entropies(path, 0, size, block_size))
+
+        bounds = split_bounds(size, workers * RANGES_PER_WORKER, block_size)
+        parts = len(bounds) - 1
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                _range_entropies,
+                [path] * parts, bounds[:-1], bounds[1:], [block_size] * parts
+            )
+            entropies = [value for part in results for value in part]
+        return cls(block_size, size, entropies)
+
+    def blocks(self) -> List[Dict]:
+        return [
+            {
+                'offset': i * self.block_size,
+                'size': min(self.block_size, self.size - i * self.block_size),
+                'entropy': entropy
+            }
+            for i, entropy in enumerate(self.entropies)
+        ]
+
+    def high_entropy_regions(self, threshold: float = 7.5) -> List[Tuple[int, int]]:
+        """Смежные области с энтропией не ниже threshold: пары (смещение, длина)."""
+        regions = []
+        start = None
+        for i, entropy in enumerate(self.entropies):
+            if entropy >= threshold:
+                if start is None:
+                    start = i
+            elif start is not None:
+                regions.append((start * self.block_size, (i - start) * self.block_size))
+                start = None
+        if start is not None:
+            regions.append((start * self.block_size, self.size - start * self.block_size))
+        return regions
+
+    def sparkline(self, width: int = 64) -> str:
+        """
+        Компактный ASCII-график: каждый символ - группа соседних блоков,
+        берется максимальная энтропия группы, чтобы не терять короткие всплески.
+        """
+        if not self.entropies:
+            return ''
+        count = len(self.entropies)
+        width = min(width, count)
+        line = []
+        for column in range(width):
+            group = self.entropies[column * count // width:(column + 1) * count // width]
+            level = int(max(group) / 8.0 * (len(SPARK_CHARS) - 1) + 0.5)
+            line.append(SPARK_CHARS[min(level, len(SPARK_CHARS) - 1)])
+        return ''.join(line)
+
+    def save(self, path: str) -> None:
+        """Сохранение профиля в CSV или JSON (по расширению файла)."""
+        blocks = self.blocks()
+        if path.lower().endswith('.json'):
+            with open(path, mode='w', encoding='utf-8') as f:
+                json.dump({'block_size': self.block_size, 'size': self.size, 'blocks': blocks}, f, indent=2)
+            return
+
+        with open(path, mode='w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['offset', 'size', 'entropy'])
+            for block in blocks:
+                writer.writerow([block['offset'], block['size'], f"{block['entropy']:.4f}"])
@@ -0,0 +1,282 @@
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .aho_corasick import AhoCorasick
+from .signature_index import SignatureKey
+
+
+# Битрейты MPEG-1 Layer III (кбит/с) и частоты дискретизации MPEG-1
+MP3_BITRATES = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+MP3_SAMPLE_RATES = (44100, 48000, 32000)
+
+
+def _check_bmp(data: bytes) -> bool:
+    """BITMAPFILEHEADER: нулевые резервные поля, смещение данных внутри файла, известный размер DIB-заголовка."""
+    if len(data) < 18:
+        return False
+    size, reserved, data_offset, dib_size = struct.unpack_from('<IIII', data, 2)
+    return (reserved == 0 and 26 <= data_offset < size
+            and dib_size in (12, 40, 52, 56, 64, 108, 124))
+
+
+def _check_mz(data: bytes) -> bool:
+    """Заголовок MZ: e_lfanew (0x3C) указывает на заголовок PE/NE/LE/LX."""
+    if len(data) < 0x40:
+        return False
+    lfanew = struct.unpack_from('<I', data, 0x3C)[0]
+    if lfanew < 0x40 or lfanew + 4 > len(data):
+        return False
+    return data[lfanew:lfanew + 4] == b'PE\x00\x00' or data[lfanew:lfanew + 2] in (b'NE', b'LE', b'LX')
+
+
+def _mp3_frame_length(data: bytes) -> int:
+    """Длина кадра MPEG-1 Layer III по его заголовку; 0 - недопустимый заголовок."""
+    if len(data) < 4:
+        return 0
+    bitrate_index, rate_index, padding = data[2] >> 4, (data[2] >> 2) & 3, (data[2] >> 1) & 1
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    return 144000 * MP3_BITRATES[bitrate_index] // MP3_SAMPLE_RATES[rate_index] + padding
+
+
+def _check_mp3(data: bytes) -> bool:
+    """Кадр MPEG-1 Layer III: допустимый заголовок, следующий кадр начинается сразу после этого."""
+    frame = _mp3_frame_length(data)
+    return frame > 0 and len(data) >= frame + 2 and data[frame] == 0xFF and data[frame + 1] & 0xFE == 0xFA
+
+
+class FileCarver:
+    """
+    Поиск файлов, встроенных в бинарные данные по любому смещению.
+    Все сигнатуры и маркеры конца ищутся одним автоматом Ахо-Корасик
+    за один проход; данные подаются чанками (feed).
+
+    Короткие сигнатуры (BM, MZ, FF FB) встречаются в любых данных, поэтому
+    вхождения типов из HEADER_CHECKS принимаются только после проверки
+    заголовка; сигнатуры короче min_signature_length без такой проверки
+    пропускаются.
+    """
+
+    # Маркеры конца: тип -> (маркер, сколько байтов файла идет после маркера)
+    FILE_FOOTERS = {
+        'JPEG Image': (b'\xFF\xD9', 0),
+        'PNG Image': (b'\x49\x45\x4E\x44\xAE\x42\x60\x82', 0),
+        'GIF Image': (b'\x00\x3B', 0),
+        'PDF Document': (b'\x25\x25\x45\x4F\x46', 0),
+        # End of central directory: 22 байта записи, маркер - первые 4
+        'ZIP Archive / DOCX / XLSX': (b'\x50\x4B\x05\x06', 18),
+    }
+
+    # Размер из заголовка: тип -> (смещение поля, формат struct, поправка к значению)
+    HEADER_SIZES = {
+        'BMP Image': (2, '<I', 0),
+        'RIFF (AVI/WAV)': (4, '<I', 8),
+    }
+
+    # Проверка заголовка: тип -> (сколько байтов от начала нужно, функция проверки)
+    HEADER_CHECKS = {
+        'BMP Image': (18, _check_bmp),
+        'DOS/Windows Executable': (1024, _check_mz),
+        'MP3 Audio': (1444, _check_mp3),
+    }
+
+    # Потоки кадров: тип -> длина кадра по заголовку. Кадр сразу за предыдущим
+    # продолжает найденное вхождение, а не открывает новое
+    FRAME_LENGTHS = {
+        'MP3 Audio': _mp3_frame_length,
+    }
+
+    # Расширения для извлеченных файлов (остальные - .bin)
+    EXTENSIONS = {
+        'JPEG Image': 'jpg',
+        'PNG Image': 'png',
+        'GIF Image': 'gif',
+        'BMP Image': 'bmp',
+        'PDF Document': 'pdf',
+        'ZIP Archive / DOCX / XLSX': 'zip',
+        'RAR Archive': 'rar',
+        'GZIP Archive': 'gz',
+        'ELF Executable': 'elf',
+        'DOS/Windows Executable': 'exe',
+        'MP3 Audio': 'mp3',
+        'MP4 Video': 'mp4',
+        'RIFF (AVI/WAV)': 'riff',
+        'OGG Audio': 'ogg',
+        'FLAC Audio': 'flac',
+    }
+
+    # Сколько незакрытых вхождений одного типа ждут маркера конца
+    MAX_OPEN = 64
+
+    def __init__(self, signatures: Dict[SignatureKey, str], min_signature_length: int = 3,
+                 max_hits: int = 10000):
+        self.max_hits = max_hits
+        self.truncated = False
+        self.hits: List[Dict] = []
+        self._seen = set()
+
+        # Паттерн -> список ролей ('header', тип, смещение сигнатуры) / ('footer', тип, 0)
+        self._roles: Dict[bytes, List[Tuple[str, str, int]]] = {}
+        for key, file_type in signatures.items():
+            offset, signature = key if isinstance(key, tuple) else (0, key)
+            if len(signature) >= min_signature_length or file_type in self.HEADER_CHECKS:
+                self._roles.setdefault(signature, []).append(('header', file_type, offset))
+        footer_types = {file_type for roles in self._roles.values() for _, file_type, _ in roles}
+        for file_type, (footer, _) in self.FILE_FOOTERS.items():
+            if file_type in footer_types:
+                self._roles.setdefault(footer, []).append(('footer', file_type, 0))
+
+        self._matcher = AhoCorasick(self._roles) if self._roles else None
+        self._open: Dict[str, List[Dict]] = {}
+        self._state = 0
+        self._size = 0
+        # Вхождения, для проверки которых еще не хватает данных: (тип, начало)
+        self._deferred: List[Tuple[str, int]] = []
+        # Последние байты предыдущих чанков для проверки заголовков на границе
+        self._tail = b''
+        self._tail_size = max(need for need, _ in self.HEADER_CHECKS.values())
+        # Последнее вхождение каждого потока кадров
+        self._streams: Dict[str, Dict] = {}
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        """Обработка очередного чанка; чанки должны идти подряд."""
+        self._size = offset + len(chunk)
+        if self._matcher is None or self.truncated:
+            return
+        if self._deferred:
+            deferred, self._deferred = self._deferred, []
+            for file_type, start in deferred:
+                self._on_candidate(file_type, start, offset, chunk)
+        # Состояние автомата переносится между чанками
+        matches, self._state = self._matcher.scan(chunk, offset, self._state)
+        for idx, position in matches:
+            pattern = self._matcher.patterns[idx]
+            roles = self._roles[pattern]
+            # Маркер конца, закрывший файл, не считается началом нового
+            # (запись конца ZIP совпадает с сигнатурой пустого архива)
+            closed = False
+            for role, file_type, _ in roles:
+                if role == 'footer':
+                    closed = self._on_footer(file_type, position) or closed
+            if not closed:
+                for role, file_type, sig_offset in roles:
+                    if role == 'header':
+                        self._on_candidate(file_type, position - sig_offset, offset, chunk)
+            if self.truncated:
+                return
+        if len(chunk) >= self._tail_size:
+            self._tail = chunk[-self._tail_size:]
+        else:
+            self._tail = (self._tail + chunk)[-self._tail_size:]
+
+    def _on_candidate(self, file_type: str, start: int, offset: int, chunk: bytes) -> None:
+        """Вхождение сигнатуры; для типов из HEADER_CHECKS - после проверки заголовка."""
+        check = self.HEADER_CHECKS.get(file_type)
+        if check is None or start < 0:
+            self._on_header(file_type, start)
+            return
+        need, is_valid = check
+        if start + need > self._size:
+            self._deferred.append((file_type, start))
+            return
+        if start >= offset:
+            data = chunk[start - offset:start - offset + need]
+        else:
+            # Заголовок начинается в предыдущем чанке
+            head = self._tail[len(self._tail) - (offset - start):]
+            data = head + chunk[:need - len(head)]
+        frame_length = self.FRAME_LENGTHS.get(file_type)
+        if frame_length is None:
+            if is_valid(data):
+                self._on_header(file_type, start)
+            return
+        self._on_frame(file_type, start, data, frame_length, is_valid)
+
+    def _on_frame(self, file_type: str, start: int, data: bytes,
+                  frame_length: Callable[[bytes], int], is_valid: Callable[[bytes], bool]) -> None:
+        stream = self._streams.get(file_type)
+        if stream is not None:
+            end = stream['offset'] + stream['length']
+            if start < end:
+                # Сигнатура внутри данных кадра
+                return
+            if start == end:
+                # Продолжение потока: достаточно допустимого заголовка кадра
+                length = frame_length(data)
+                if length:
+                    stream['length'] += length
+                    return
+        if is_valid(data):
+            hit = self._on_header(file_type, start)
+            if hit is not None:
+                hit['length'] = frame_length(data)
+                hit['length_source'] = 'header'
+                self._streams[file_type] = hit
+
+    def _on_header(self, file_type: str, start: int) -> Optional[Dict]:
+        # Один тип может задаваться несколькими сигнатурами (MP4)
+        if start < 0 or (start, file_type) in self._seen:
+            return None
+        if len(self.hits) >= self.max_hits:
+            self.truncated = True
+            return None
+        hit = {'offset': start, 'type': file_type, 'length': None, 'length_source': None}
+        self.hits.append(hit)
+        self._seen.add((start, file_type))
+        if file_type in self.FILE_FOOTERS:
+            stack = self._open.setdefault(file_type, [])
+            stack.append(hit)
+            if len(stack) > self.MAX_OPEN:
+                del stack[0]
+        return hit
+
+    def _on_footer(self, file_type: str, marker_start: int) -> bool:
+        # Закрывается последнее открытое вхождение: вложенные файлы
+        # (например, миниатюра внутри JPEG) заканчиваются раньше внешних
+        stack = self._open.get(file_type)
+        if stack and stack[-1]['offset'] < marker_start:
+            hit = stack.pop()
+            marker, extra = self.FILE_FOOTERS[file_type]
+            hit['length'] = marker_start + len(marker) + extra - hit['offset']
+            hit['length_source'] = 'footer'
+            return True
+        return False
+
+    def result(self, read_at=None) -> List[Dict]:
+        """
+        Таблица найденных вхождений (offset, type, length, length_source).
+        Длина берется из маркера конца, из заголовка (read_at(offset, size)
+        читает байты файла) или оценивается до следующего вхождения / конца данных.
+        """
+        # Данные кончились: оставшиеся вхождения проверяются по тому, что есть
+        for file_type, start in self._deferred:
+            if self.truncated:
+                break
+            data = self._tail[start - self._size:]
+            is_valid = self.HEADER_CHECKS[file_type][1]
+            frame_length = self.FRAME_LENGTHS.get(file_type)
+            if frame_length is not None:
+                self._on_frame(file_type, start, data, frame_length, is_valid)
+            elif is_valid(data):
+                self._on_header(file_type, start)
+        self._deferred = []
+
+        hits = sorted(self.hits, key=lambda h: h['offset'])
+        for i, hit in enumerate(hits):
+            if hit['length'] is not None:
+                hit['length'] = min(hit['length'], self._size - hit['offset'])
+                continue
+            size_field = self.HEADER_SIZES.get(hit['type'])
+            if size_field and read_at is not None:
+                field_offset, fmt, delta = size_field
+                raw = read_at(hit['offset'] + field_offset, struct.calcsize(fmt))
+                if len(raw) == struct.calcsize(fmt):
+                    length = struct.unpack(fmt, raw)[0] + delta
+                    if 0 < length <= self._size - hit['offset']:
+                        hit['length'] = length
+                        hit['length_source'] = 'header'
+                        continue
+            next_offset = next((h['offset'] for h in hits[i + 1:] if h['offset'] > hit['offset']), self._size)
+            hit['length'] = next_offset - hit['offset']
+            hit['length_source'] = 'estimate'
+        return hits
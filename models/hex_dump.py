@@ -0,0 +1,257 @@
+import argparse
+import sys
+from typing import BinaryIO, Iterable, List, Optional, TextIO
+
+from .byte_transforms import ASCII_TABLE
+
+
+# Байтов в строке дампа (как у hexdump -C и xxd по умолчанию)
+LINE_BYTES = 16
+# Блок чтения при экспорте и размер порции строк при импорте
+DUMP_BLOCK_SIZE = 1024 * 1024
+
+FORMATS = ('hexdump', 'xxd')
+
+
+class HexDumpWriter:
+    """
+    Форматирование дампа блоками: hex и ASCII строятся одним вызовом
+    bytes.hex / translate на блок, строки - срезами готовых строк.
+    Формат 'hexdump' совпадает с hexdump -C (повторяющиеся строки
+    сворачиваются в '*', если squeeze), 'xxd' - с xxd без параметров.
+    """
+
+    def __init__(self, fmt: str = 'hexdump', squeeze: bool = True):
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат дампа: {fmt}")
+        self.fmt = fmt
+        self.squeeze = squeeze and fmt == 'hexdump'
+        self._previous: Optional[str] = None  # hex предыдущей строки
+        self._starred = False
+
+    def format_block(self, offset: int, data: bytes) -> str:
+        """Строки дампа для блока, начинающегося с offset (кратного 16)."""
+        if self.fmt == 'xxd':
+            return self._xxd(offset, data)
+        return self._hexdump(offset, data)
+
+    def _hexdump(self, offset: int, data: bytes) -> str:
+        hex_all = data.hex(' ')
+        ascii_all = data.translate(ASCII_TABLE).decode('ascii')
+        full = len(data) - len(data) % LINE_BYTES
+        lines = []
+
+        for i, j in zip(range(0, full, LINE_BYTES), range(0, full * 3, LINE_BYTES * 3)):
+            hex_line = hex_all[j:j + 47]
+            if self.squeeze:
+                if hex_line == self._previous:
+                    if not self._starred:
+                        lines.append('*\n')
+                        self._starred = True
+                    continue
+                self._previous = hex_line
+                self._starred = False
+            lines.append(f"{offset + i:08x}  {hex_line[:23]}  {hex_line[24:]}  |{ascii_all[i:i + LINE_BYTES]}|\n")
+
+        if full < len(data):
+            hex_line = hex_all[full * 3:]
+            if len(hex_line) > 23:
+                hex_line = f"{hex_line[:23]}  {hex_line[24:]}"
+            lines.append(f"{offset + full:08x}  {hex_line:<48}  |{ascii_all[full:]}|\n")
+        return ''.join(lines)
+
+    def _xxd(self, offset: int, data: bytes) -> str:
+        # Группы по 2 байта, отсчет от начала строки
+        hex_all = data.hex(' ', -2)
+        ascii_all = data.translate(ASCII_TABLE).decode('ascii')
+        lines = [
+            f"{offset + i:08x}: {hex_all[j:j + 39]:<39}  {ascii_all[i:i + LINE_BYTES]}\n"
+            for i, j in zip(range(0, len(data), LINE_BYTES), range(0, len(hex_all) + 1, 40))
+        ]
+        return ''.join(lines)
+
+    def finish(self, size: int) -> str:
+        """Завершающая строка: hexdump -C выводит итоговое смещение."""
+        if self.fmt == 'hexdump' and size > 0:
+            return f"{size:08x}\n"
+        return ''
+
+
+def export_dump(src: BinaryIO, out: TextIO, fmt: str = 'hexdump', squeeze: bool = True,
+                block_size: int = DUMP_BLOCK_SIZE) -> int:
+    """Потоковый экспорт дампа из двоичного потока в текстовый. Возвращает число байтов."""
+    writer = HexDumpWriter(fmt, squeeze)
+    block_size = max(LINE_BYTES, block_size - block_size % LINE_BYTES)
+    offset = 0
+    while block := src.read(block_size):
+        out.write(writer.format_block(offset, block))
+        offset += len(block)
+    out.write(writer.finish(offset))
+    return offset
+
+
+class HexDumpReader:
+    """
+    Обратное преобразование дампа hexdump -C или xxd в двоичные данные.
+    Формат определяется по строке (у xxd после смещения стоит ':').
+    Порция одинаковых полных строк с последовательными смещениями
+    разбирается одним bytes.fromhex; '*' (свернутые повторы) и разрывы
+    смещений обрабатываются построчно.
+    """
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.position = 0            # текущая позиция записи
+        self.size = 0                # максимальное записанное смещение
+        self._last_line = b''        # данные последней строки (для '*')
+        self._repeat = False
+
+    def feed_lines(self, lines: List[str]) -> None:
+        if not self._fast_path(lines):
+            for line in lines:
+                self._parse_line(line)
+
+    def _fast_path(self, lines: List[str]) -> bool:
+        """Порция только из полных строк одного формата с последовательными смещениями."""
+        if self._repeat or len(lines) < 2:
+            return False
+        first = lines[0]
+        colon = first.find(':')
+        space = first.find(' ')
+        if 0 < colon < space:
+            width = colon
+            hex_start, hex_end, length = width + 2, width + 41, width + 60
+        elif space > 0:
+            width = space
+            hex_start, hex_end, length = width + 2, width + 50, width + 71
+        else:
+            return False
+
+        if any(len(line) != length for line in lines) or '*\n' in lines:
+            return False
+        try:
+            start = int(first[:width], 16)
+            end = int(lines[-1][:width], 16)
+        except ValueError:
+            return False
+        if start != self.position or end - start != (len(lines) - 1) * LINE_BYTES:
+            return False
+
+        try:
+            data = bytes.fromhex(''.join([line[hex_start:hex_end] for line in lines]))
+        except ValueError:
+            return False
+        if len(data) != len(lines) * LINE_BYTES:
+            return False
+        self._write(start, data)
+        return True
+
+    def _parse_line(self, line: str) -> None:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            return
+        if line.startswith('*'):
+            self._repeat = True
+            return
+
+        head, sep, rest = line.partition(':')
+        if sep and ' ' not in head:
+            # xxd: hex до первого двойного пробела, дальше ASCII
+            hex_part = rest[1:].split('  ', 1)[0]
+        else:
+            head, _, rest = line.partition(' ')
+            # hexdump -C: hex до '|', строка из одного смещения - конец данных
+            hex_part = rest.split('|', 1)[0]
+
+        try:
+            offset = int(head, 16)
+            data = bytes.fromhex(hex_part)
+        except ValueError:
+            raise ValueError(f"Неверная строка дампа: {line[:80]}") from None
+
+        if self._repeat:
+            self._fill_repeat(offset)
+        if data:
+            self._write(offset, data)
+            self._last_line = data
+        elif offset > self.size:
+            # Итоговое смещение hexdump: файл заканчивается здесь
+            self.size = offset
+
+    def _fill_repeat(self, until: int) -> None:
+        """Повтор последней строки до смещения until (строки, свернутые в '*')."""
+        self._repeat = False
+        if not self._last_line:
+            return
+        count = (until - self.position) // len(self._last_line)
+        batch = max(1, DUMP_BLOCK_SIZE // len(self._last_line))
+        while count > 0:
+            n = min(count, batch)
+            self._write(self.position, self._last_line * n)
+            count -= n
+
+    def _write(self, offset: int, data: bytes) -> None:
+        if offset != self.position:
+            self.out.seek(offset)
+        self.out.write(data)
+        self.position = offset + len(data)
+        self.size = max(self.size, self.position)
+        if len(data) >= LINE_BYTES:
+            self._last_line = data[-LINE_BYTES:]
+
+    def finish(self) -> int:
+        """Дополнение файла до итогового смещения; возвращает размер."""
+        self.out.truncate(self.size)
+        return self.size
+
+
+def import_dump(lines: Iterable[str], out: BinaryIO) -> int:
+    """Восстановление двоичных данных из строк дампа. Возвращает размер результата."""
+    reader = HexDumpReader(out)
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= 4096:
+            reader.feed_lines(batch)
+            batch = []
+    if batch:
+        reader.feed_lines(batch)
+    return reader.finish()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Командная строка: python -m models.hex_dump [-r] [-f xxd] [вход [выход]]"""
+    parser = argparse.ArgumentParser(description="Hex-дамп в формате hexdump -C / xxd и обратно.")
+    parser.add_argument('-r', '--reverse', action='store_true', help="дамп -> двоичный файл")
+    parser.add_argument('-f', '--format', choices=FORMATS, default='hexdump')
+    parser.add_argument('-v', '--no-squeeze', action='store_true', help="не сворачивать повторы в '*'")
+    parser.add_argument('input', nargs='?', default='-')
+    parser.add_argument('output', nargs='?', default='-')
+    args = parser.parse_args(argv)
+
+    if args.reverse:
+        if args.output == '-':
+            parser.error("для -r нужен выходной файл (нужна перемотка)")
+        src = sys.stdin if args.input == '-' else open(args.input, mode='r', encoding='ascii')
+        try:
+            with open(args.output, mode='wb') as out:
+                import_dump(src, out)
+        finally:
+            if src is not sys.stdin:
+                src.close()
+        return 0
+
+    src = sys.stdin.buffer if args.input == '-' else open(args.input, mode='rb')
+    out = sys.stdout if args.output == '-' else open(args.output, mode='w', encoding='ascii')
+    try:
+        export_dump(src, out, args.format, not args.no_squeeze)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
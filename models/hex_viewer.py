@@ -1,5 +1,9 @@
-from .binary_file import BinaryFile
-from typing import Generator, Tuple
+import os
+from collections import OrderedDict
+from .binary_file import BinaryFile, _pread
+from .byte_transforms import ASCII_TABLE
+from .hex_dump import export_dump, import_dump
+from typing import Dict, Generator, List, Optional, TextIO, Tuple
 
 
 class HexViewer:
@@ -23,29 +27,45 @@ class HexViewer:
 
     def format_hex_line(self, offset: int, data: bytes) -> str:
         """Форматирование одной строки hex-просмотра."""
-        # Смещение
-        line = f"{offset:08X}  "
+        return self._render(offset, data.hex(' ').upper(), data.translate(ASCII_TABLE).decode('ascii'))
 
-        # Hex-представление
-        hex_parts = []
-        for i in range(self.bytes_per_line):
-            if i < len(data):
-                hex_parts.append(self.byte_to_hex(data[i]))
-            else:
-                hex_parts.append("  ")
+    def _render(self, offset: int, hex_str: str, ascii_str: str) -> str:
+        # Недостающие байты последней строки заполняются пробелами (по 3 символа на байт)
+        width = self.bytes_per_line * 3 - 1
+        if len(hex_str) < width:
+            hex_str += ' ' * (width - len(hex_str))
+        # Дополнительный разделитель после 8 байт
+        if self.bytes_per_line >= 8:
+            hex_str = f"{hex_str[:23]}  {hex_str[23:]}"
+        return f"{offset:08X}  {hex_str}  |{ascii_str}|"
 
-            # Добавляем разделитель после 8 байт
-            if i == 7:
-                hex_parts.append(" ")
+    def render_lines(self, offset: int, data) -> List[str]:
+        """
+        Форматирование блока сразу на несколько строк.
+        hex и ASCII строятся одним вызовом на весь блок (bytes.hex, translate),
+        строки получаются срезами готовых строк без обработки отдельных байтов.
+        """
+        view = memoryview(data)
+        hex_all = view.hex(' ').upper()
+        ascii_all = view.tobytes().translate(ASCII_TABLE).decode('ascii')
+        bpl = self.bytes_per_line
+        size = len(view)
+        full = size - size % bpl
 
-        line += " ".join(hex_parts)
-        line += "  "
-
-        # ASCII-представление
-        ascii_repr = ''.join(self.byte_to_ascii(b) for b in data)
-        line += f"|{ascii_repr}|"
-
-        return line
+        if bpl >= 8:
+            # Полные строки: разделитель после 8 байт вставляется срезом
+            lines = [
+                f"{offset + i:08X}  {hex_all[j:j + 23]}  {hex_all[j + 23:j + bpl * 3 - 1]}  |{ascii_all[i:i + bpl]}|"
+                for i, j in zip(range(0, full, bpl), range(0, full * 3, bpl * 3))
+            ]
+        else:
+            lines = [
+                f"{offset + i:08X}  {hex_all[j:j + bpl * 3 - 1]}  |{ascii_all[i:i + bpl]}|"
+                for i, j in zip(range(0, full, bpl), range(0, full * 3, bpl * 3))
+            ]
+        if full < size:
+            lines.append(self._render(offset + full, hex_all[full * 3:], ascii_all[full:]))
+        return lines
 
     def view_range(self, start_offset: int = 0, lines: int = 16) -> Generator[str, None, None]:
         """Просмотр диапазона файла."""
@@ -55,12 +75,7 @@ class HexViewer:
 
         bytes_to_read = lines * self.bytes_per_line
         data = self.file.read_bytes(start_offset, bytes_to_read)
-
-        offset = start_offset
-        for i in range(0, len(data), self.bytes_per_line):
-            chunk = data[i:i + self.bytes_per_line]
-            yield self.format_hex_line(offset, chunk)
-            offset += self.bytes_per_line
+        yield from self.render_lines(start_offset, data)
 
     def view_all_paged(self, lines_per_page: int = 16) -> Generator[Tuple[int, list], None, None]:
         """Постраничный просмотр всего файла."""
@@ -68,71 +83,155 @@ class HexViewer:
             yield (0, ["Файл не найден"])
             return
 
-        offset = 0
-        page_lines = []
+        # Читаем сразу несколько страниц, страницы - срезы memoryview без копирования
+        page_size = lines_per_page * self.bytes_per_line
+        read_size = page_size * max(1, BinaryFile.BUFFER_SIZE // page_size)
+
+        for block_offset, block in self.file.read_chunks(read_size):
+            view = memoryview(block)
+            for i in range(0, len(view), page_size):
+                yield (block_offset + i, self.render_lines(block_offset + i, view[i:i + page_size]))
 
-        for chunk_offset, chunk in self.file.read_chunks(self.bytes_per_line):
-            line = self.format_hex_line(chunk_offset, chunk)
-            page_lines.append(line)
+    # Максимум строк с совпадениями в одном блоке: плотные совпадения не копятся в памяти
+    MAX_BLOCK_LINES = 256
 
-            if len(page_lines) >= lines_per_page:
-                yield (offset, page_lines)
-                offset = chunk_offset + len(chunk)
-                page_lines = []
+    def search_and_highlight(self, pattern: bytes, context_lines: int = 2,
+                             max_results: int = -1) -> Generator[Dict, None, None]:
+        """
+        Поиск паттерна и отображение с контекстом за один последовательный проход.
+        Возвращает блоки {'offset', 'offsets', 'lines'}: пересекающиеся контексты
+        соседних совпадений объединяются в один блок, строки с совпадением
+        помечаются '>>>', а под найденными байтами ставится строка с '^'.
+        """
+        if not pattern or not self.file.exists():
+            return
 
-        if page_lines:
-            yield (offset, page_lines)
+        bpl = self.bytes_per_line
+        read_size = max(1, BinaryFile.BUFFER_SIZE // bpl) * bpl
+        found = 0
+        block = None  # [первая строка, последняя строка, смещения совпадений]
 
-    def search_and_highlight(self, pattern: bytes, context_lines: int = 2) -> list:
-        """Поиск паттерна и отображение с контекстом."""
-        offsets = self.file.find_bytes(pattern, max_results=50)
-        results = []
+        with open(self.file.path, mode='rb') as f:
+            buf = b''
+            base = 0   # смещение buf[0] в файле, всегда на границе строки
+            pos = 0    # откуда продолжать поиск
+            eof = False
 
-        for offset in offsets:
-            start_line_offset = (offset // self.bytes_per_line) * self.bytes_per_line
-            start_offset = max(0, start_line_offset - context_lines * self.bytes_per_line)
+            def flush() -> Dict:
+                nonlocal buf, eof
+                first_line, last_line, offsets = block
+                # Дочитываем строки контекста после последнего совпадения
+                end = (last_line + context_lines + 1) * bpl
+                if end > base + len(buf) and not eof:
+                    tail = f.read(end - base - len(buf))
+                    eof = not tail
+                    buf += tail
+                start = max(0, first_line - context_lines) * bpl
+                data = buf[start - base:end - base]
+                return {
+                    'offset': offsets[0],
+                    'offsets': offsets,
+                    'lines': self._highlight(start, data, offsets, len(pattern))
+                }
 
-            lines_to_show = context_lines * 2 + 1
-            data = self.file.read_bytes(start_offset, lines_to_show * self.bytes_per_line)
+            while True:
+                idx = buf.find(pattern, pos - base)
+                if idx == -1:
+                    if eof:
+                        break
+                    pos = max(pos, base + len(buf) - len(pattern) + 1)
+                    # Кольцевой буфер: храним только строки текущего блока
+                    # и context_lines строк перед местом продолжения поиска
+                    keep_line = max(0, pos // bpl - context_lines)
+                    if block:
+                        keep_line = min(keep_line, max(0, block[0] - context_lines))
+                    cut = keep_line * bpl - base
+                    if cut > 0:
+                        buf = buf[cut:]
+                        base += cut
+                    chunk = f.read(read_size)
+                    eof = not chunk
+                    buf += chunk
+                    continue
 
-            result_lines = []
-            current_offset = start_offset
-            for i in range(0, len(data), self.bytes_per_line):
-                chunk = data[i:i + self.bytes_per_line]
-                line = self.format_hex_line(current_offset, chunk)
+                match = base + idx
+                pos = match + 1
+                first_line = match // bpl
+                last_line = (match + len(pattern) - 1) // bpl
 
-                # Помечаем строку с найденным паттерном
-                if start_line_offset <= current_offset <= start_line_offset + self.bytes_per_line:
-                    line = ">>> " + line
+                if block and (first_line - context_lines > block[1] + context_lines + 1
+                              or block[1] - block[0] >= self.MAX_BLOCK_LINES):
+                    yield flush()
+                    block = None
+
+                if block is None:
+                    block = [first_line, last_line, [match]]
                 else:
-                    line = "    " + line
+                    block[1] = max(block[1], last_line)
+                    block[2].append(match)
+
+                found += 1
+                if found == max_results:
+                    break
 
-                result_lines.append(line)
-                current_offset += self.bytes_per_line
+            if block:
+                yield flush()
 
-            results.append({
-                'offset': offset,
-                'lines': result_lines
-            })
+    def _highlight(self, start: int, data: bytes, offsets: List[int], length: int) -> List[str]:
+        """Строки блока с пометкой '>>>' и строкой '^' под совпавшими байтами."""
+        bpl = self.bytes_per_line
+        marked: Dict[int, set] = {}
+        for offset in offsets:
+            for position in range(max(offset, start), min(offset + length, start + len(data))):
+                marked.setdefault((position - start) // bpl, set()).add((position - start) % bpl)
+
+        result = []
+        for index, line in enumerate(self.render_lines(start, data)):
+            columns = marked.get(index)
+            if not columns:
+                result.append("    " + line)
+                continue
+            result.append(">>> " + line)
+
+            # Колонки hex и ASCII считаются от фактической ширины смещения
+            hex_start = len(f"{start + index * bpl:08X}") + 2
+            ascii_start = hex_start + bpl * 3 - 1 + (2 if bpl >= 8 else 0) + 3
+            marker = [' '] * len(line)
+            for column in columns:
+                hex_column = hex_start + column * 3 + (2 if bpl >= 8 and column >= 8 else 0)
+                marker[hex_column] = marker[hex_column + 1] = '^'
+                marker[ascii_start + column] = '^'
+            result.append("    " + ''.join(marker).rstrip())
+        return result
+
+    def export_dump(self, out: TextIO, fmt: str = 'hexdump', squeeze: bool = True) -> int:
+        """Экспорт всего файла в формате hexdump -C или xxd в текстовый поток (файл, stdout)."""
+        with open(self.file.path, mode='rb') as src:
+            return export_dump(src, out, fmt, squeeze)
 
-        return results
+    @staticmethod
+    def import_dump(dump_path: str, output_path: str) -> int:
+        """Восстановление двоичного файла из дампа hexdump -C / xxd. Возвращает размер."""
+        with open(dump_path, mode='r', encoding='ascii') as dump, open(output_path, mode='wb') as out:
+            return import_dump(dump, out)
 
-    def get_file_info(self) -> dict:
+    def get_file_info(self, threaded: bool = False) -> dict:
         """Получение информации о файле."""
         if not self.file.exists():
             return {'error': 'Файл не найден'}
 
         size = self.file.get_size()
         signature = self.file.get_file_signature()
+        checksums = self.file.calculate_checksums(['md5', 'sha1', 'sha256'], threaded=threaded)
 
         return {
             'path': self.file.path,
             'size': size,
             'size_formatted': self._format_size(size),
             'signature': ' '.join(self.byte_to_hex(b) for b in signature),
-            'md5': self.file.calculate_checksum('md5'),
-            'sha1': self.file.calculate_checksum('sha1'),
-            'sha256': self.file.calculate_checksum('sha256')
+            'md5': checksums['md5'],
+            'sha1': checksums['sha1'],
+            'sha256': checksums['sha256']
         }
 
     @staticmethod
@@ -142,4 +241,117 @@ class HexViewer:
             if size < 1024.0:
                 return f"{size:.2f} {unit}"
             size /= 1024.0
-        return f"{size:.2f} TB"
\ No newline at end of file
+        return f"{size:.2f} TB"
+
+
+class HexNavigator:
+    """
+    Навигация по hex-просмотру с произвольным доступом.
+    Страница читается через pread по своему смещению, поэтому переход
+    в середину файла любого размера не требует чтения предыдущих данных.
+    Отформатированные страницы хранятся в LRU-кэше.
+    """
+
+    def __init__(self, viewer: HexViewer, lines_per_page: int = 16, cache_pages: int = 64):
+        self.viewer = viewer
+        self.page_size = lines_per_page * viewer.bytes_per_line
+        self.cache_pages = cache_pages
+        self.page = 0
+        # Смещение последнего найденного совпадения (поиск продолжается от него)
+        self.match: Optional[int] = None
+        self._history: List[int] = []
+        self._cache: 'OrderedDict[int, List[str]]' = OrderedDict()
+        self._fd = os.open(viewer.file.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> 'HexNavigator':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def size(self) -> int:
+        return os.fstat(self._fd).st_size
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-self.size // self.page_size))
+
+    @property
+    def offset(self) -> int:
+        """Смещение начала текущей страницы."""
+        return self.page * self.page_size
+
+    def lines(self) -> List[str]:
+        """Строки текущей страницы (из кэша или с диска)."""
+        lines = self._cache.get(self.page)
+        if lines is not None:
+            self._cache.move_to_end(self.page)
+            return lines
+
+        data = _pread(self._fd, self.page_size, self.offset)
+        lines = self.viewer.render_lines(self.offset, data)
+        self._cache[self.page] = lines
+        if len(self._cache) > self.cache_pages:
+            self._cache.popitem(last=False)
+        return lines
+
+    def _jump(self, page: int) -> List[str]:
+        page = min(max(0, page), self.page_count - 1)
+        if page != self.page:
+            self._history.append(self.page)
+        self.page = page
+        return self.lines()
+
+    def goto_page(self, page: int) -> List[str]:
+        self.match = None
+        return self._jump(page)
+
+    def goto(self, offset: int) -> List[str]:
+        """Переход к странице, содержащей offset."""
+        self.match = None
+        return self._jump(offset // self.page_size)
+
+    def next_page(self) -> Optional[List[str]]:
+        """Следующая страница; None - текущая страница последняя."""
+        if self.page + 1 >= self.page_count:
+            return None
+        self.page += 1
+        return self.lines()
+
+    def prev_page(self) -> Optional[List[str]]:
+        if self.page == 0:
+            return None
+        self.page -= 1
+        return self.lines()
+
+    def back(self) -> Optional[List[str]]:
+        """Возврат на страницу, с которой был сделан последний переход."""
+        if not self._history:
+            return None
+        self.page = self._history.pop()
+        self.match = None
+        return self.lines()
+
+    def search_forward(self, pattern: bytes) -> Optional[int]:
+        """Поиск вперед от текущего совпадения или начала страницы; переход к найденному."""
+        start = self.match + 1 if self.match is not None else self.offset
+        found = next(self.viewer.file.iter_find_bytes(pattern, start), None)
+        if found is not None:
+            self._jump(found // self.page_size)
+            self.match = found
+        return found
+
+    def search_backward(self, pattern: bytes) -> Optional[int]:
+        """Поиск назад от текущего совпадения или начала страницы."""
+        end = self.match if self.match is not None else self.offset
+        found = self.viewer.file.rfind_bytes(pattern, end)
+        if found is not None:
+            self._jump(found // self.page_size)
+            self.match = found
+        return found
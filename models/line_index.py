@@ -0,0 +1,164 @@
+import os
+import struct
+from array import array
+from typing import Optional
+
+
+class LineIndex:
+    """
+    Индекс смещений строк текстового файла.
+    Хранит байтовое смещение начала каждой step-й строки (0, step, 2*step, ...),
+    поэтому переход к строке N требует чтения не более step строк.
+    Строки считаются по байту '\\n', что верно для кодировок, совместимых с ASCII.
+
+    Индекс сохраняется рядом с файлом (<файл>.lidx) и считается актуальным,
+    пока размер и время изменения файла совпадают с записанными.
+    """
+
+    MAGIC = b'L1LIDX01'
+    # step, size, mtime_ns, newlines, tail_start
+    HEADER = struct.Struct('<IQqQQ')
+    SUFFIX = '.lidx'
+    DEFAULT_STEP = 1024
+
+    # Окно подсчета '\n': find вызывается только внутри окна с нужной строкой
+    SCAN_WINDOW = 4096
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, path: str, step: int = DEFAULT_STEP):
+        if step <= 0:
+            raise ValueError("Шаг индекса должен быть положительным.")
+        self.path = path
+        self.step = step
+        self.offsets = array('Q', [0])
+        self.size = 0          # проиндексированный размер файла
+        self.mtime_ns = 0
+        self.newlines = 0      # количество '\n' в проиндексированной части
+        self.tail_start = 0    # начало строки после последнего '\n'
+
+    @classmethod
+    def sidecar_path(cls, path: str) -> str:
+        return path + cls.SUFFIX
+
+    @property
+    def line_count(self) -> int:
+        """Количество строк (последняя строка без '\\n' тоже считается)."""
+        return self.newlines + (1 if self.size > self.tail_start else 0)
+
+    @classmethod
+    def open(cls, path: str, step: int = DEFAULT_STEP) -> 'LineIndex':
+        """Загрузка актуального индекса или построение нового (с сохранением)."""
+        index = cls.load(path)
+        if index is None or index.step != step:
+            index = cls(path, step)
+            index.update()
+            index.save()
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> Optional['LineIndex']:
+        """Индекс из файла-спутника; None, если его нет или файл с тех пор изменился."""
+        try:
+            with open(cls.sidecar_path(path), mode='rb') as f:
+                header = f.read(len(cls.MAGIC) + cls.HEADER.size)
+                if not header.startswith(cls.MAGIC) or len(header) != len(cls.MAGIC) + cls.HEADER.size:
+                    return None
+                step, size, mtime_ns, newlines, tail_start = cls.HEADER.unpack(header[len(cls.MAGIC):])
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+            st = os.stat(path)
+        except (OSError, ValueError):
+            return None
+
+        if st.st_size != size or st.st_mtime_ns != mtime_ns or not offsets:
+            return None
+        index = cls(path, step)
+        index.offsets = offsets
+        index.size, index.mtime_ns, index.newlines, index.tail_start = size, mtime_ns, newlines, tail_start
+        return index
+
+    def save(self) -> None:
+        """Запись файла-спутника; ошибки записи (например, каталог только для чтения) не критичны."""
+        try:
+            with open(self.sidecar_path(self.path), mode='wb') as f:
+                f.write(self.MAGIC + self.HEADER.pack(self.step, self.size, self.mtime_ns,
+                                                      self.newlines, self.tail_start))
+                self.offsets.tofile(f)
+        except OSError:
+            pass
+
+    @classmethod
+    def remove(cls, path: str) -> None:
+        try:
+            os.remove(cls.sidecar_path(path))
+        except OSError:
+            pass
+
+    def update(self) -> None:
+        """
+        Дополнение индекса данными, дописанными в конец файла после
+        последнего обновления (для нового индекса - весь файл).
+        """
+        with open(self.path, mode='rb') as f:
+            f.seek(self.size)
+            base = self.size
+            while chunk := f.read(self.READ_SIZE):
+                self._scan(chunk, base)
+                base += len(chunk)
+            self.size = base
+            self.mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+
+    def _scan(self, chunk: bytes, base: int) -> None:
+        count = chunk.count(b'\n')
+        if not count:
+            return
+        # Строка с номером k*step начинается после k*step-го '\n'
+        target = len(self.offsets) * self.step
+        pos = 0
+        seen = self.newlines
+        window = self.SCAN_WINDOW
+        while self.newlines + count >= target:
+            # Пропускаем окна без нужного '\n' одним подсчетом на окно
+            while True:
+                in_window = chunk.count(b'\n', pos, pos + window)
+                if seen + in_window >= target:
+                    break
+                seen += in_window
+                pos += window
+            for _ in range(target - seen):
+                pos = chunk.index(b'\n', pos) + 1
+            seen = target
+            self.offsets.append(base + pos)
+            target += self.step
+        self.newlines += count
+        self.tail_start = base + chunk.rindex(b'\n') + 1
+
+    def locate(self, line: int) -> int:
+        """
+        Смещение начала строки line (нумерация с 0).
+        Читается не более step строк от ближайшей точки индекса.
+        """
+        if line <= 0:
+            return 0
+        if line >= self.line_count:
+            return self.size
+        checkpoint = min(line // self.step, len(self.offsets) - 1)
+        pos = self.offsets[checkpoint]
+        remaining = line - checkpoint * self.step
+        with open(self.path, mode='rb') as f:
+            f.seek(pos)
+            while remaining > 0:
+                chunk = f.read(self.READ_SIZE)
+                if not chunk:
+                    break
+                count = chunk.count(b'\n')
+                if count < remaining:
+                    remaining -= count
+                    pos += len(chunk)
+                    continue
+                idx = 0
+                for _ in range(remaining):
+                    idx = chunk.index(b'\n', idx) + 1
+                pos += idx
+                remaining = 0
+        return pos
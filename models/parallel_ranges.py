@@ -0,0 +1,28 @@
+import os
+from typing import List, Optional
+
+# Файлы меньше этого размера обрабатываются в текущем процессе:
+# запуск пула и передача результатов между процессами дороже самой работы
+PARALLEL_THRESHOLD = 16 * 1024 * 1024
+# Диапазонов на процесс: скорость обработки зависит от содержимого, и мелкие
+# диапазоны позволяют освободившимся процессам забрать оставшуюся работу
+RANGES_PER_WORKER = 4
+
+
+def pool_size(size: int, workers: Optional[int] = None) -> int:
+    """Сколько процессов использовать для файла размером size (1 - обработка в текущем процессе)."""
+    if size < PARALLEL_THRESHOLD:
+        return 1
+    return workers or os.cpu_count() or 1
+
+
+def split_bounds(size: int, parts: int, unit: int = 1) -> List[int]:
+    """
+    Границы не более parts почти равных диапазонов [0, size).
+    Все границы, кроме последней (size), кратны unit.
+    """
+    units = -(-size // unit)
+    parts = max(1, min(units, parts))
+    bounds = [(i * units // parts) * unit for i in range(parts + 1)]
+    bounds[-1] = size
+    return bounds
@@ -0,0 +1,326 @@
+from abc import ABC, abstractmethod
+from array import array
+from collections import Counter
+from heapq import heappush, heapreplace, nlargest, nsmallest
+from itertools import chain, compress
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class WindowScanner(ABC):
+    """
+    Окна одной длины по данным, поданным чанками (feed); окна на границах
+    чанков учитываются, через разрыв между несмежными чанками - нет.
+    Окна каждого блока передаются в _count_windows одним списком.
+    """
+
+    # Размер блока, по которому окна обрабатываются за один раз
+    BLOCK_SIZE = 256 * 1024
+
+    def __init__(self, length: int):
+        self.length = length
+        self._tail = b''
+        self._next_offset = 0
+
+    @classmethod
+    def sample_offsets(cls, size: int, sample_ratio: float) -> List[int]:
+        """Смещения равномерно выбранной доли sample_ratio блоков файла размером size."""
+        blocks = -(-size // cls.BLOCK_SIZE)
+        selected = max(1, int(blocks * sample_ratio))
+        return [(i * blocks // selected) * cls.BLOCK_SIZE for i in range(selected)]
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        """Учет очередного чанка, начинающегося со смещения offset."""
+        for i in range(0, len(chunk), self.BLOCK_SIZE):
+            self._feed_block(offset + i, chunk[i:i + self.BLOCK_SIZE])
+
+    def _feed_block(self, offset: int, block: bytes) -> None:
+        if offset != self._next_offset:
+            # Чанки идут не подряд (выборочный режим) - окна через разрыв не считаем
+            self._tail = b''
+
+        length = self.length
+        buf = self._tail + block
+        # Хвост короче окна, поэтому все окна буфера новые
+        last = len(buf) - length + 1
+        if last > 0:
+            windows = list(map(buf.__getitem__, map(slice, range(last), range(length, last + length))))
+            self._count_windows(windows, offset - len(self._tail))
+
+        keep = length - 1
+        self._tail = buf[max(0, len(buf) - keep):] if keep > 0 else b''
+        self._next_offset = offset + len(block)
+
+    @abstractmethod
+    def _count_windows(self, windows: List[bytes], start: int) -> None:
+        """Учет окон блока; первое окно начинается со смещения start."""
+
+
+class RepeatFinder(WindowScanner):
+    """
+    Первый проход поиска повторов: кандидаты длины min_length.
+
+    Окна считаются только одной длины, поэтому работа на байт не зависит
+    от диапазона длин: более длинные повторы - продолжения кандидатов,
+    их находит RepeatCounter. Количества окон копятся в count-min sketch
+    (две строки счетчиков, консервативное обновление): его размер
+    фиксирован, и он помнит окна из всех прошлых блоков, так что повтор,
+    разнесенный по разным блокам, получает оценку 2 при втором вхождении.
+    Окна с оценкой не меньше 2 попадают в словарь кандидатов; при его
+    переполнении остаются capacity кандидатов с наибольшей оценкой.
+    Оценки бывают только завышенными, точные количества считает CandidateCounter.
+    """
+
+    # Границы числа счетчиков в строке sketch (степени двойки)
+    MIN_SKETCH_BITS = 16
+    MAX_SKETCH_BITS = 22
+
+    def __init__(self, min_length: int = 4, capacity: int = 200000, size_hint: Optional[int] = None):
+        super().__init__(min_length)
+        self.capacity = capacity
+
+        # Строка sketch примерно вдвое длиннее числа окон (не больше 2**MAX_SKETCH_BITS)
+        bits = self.MAX_SKETCH_BITS
+        if size_hint is not None:
+            bits = min(bits, max(self.MIN_SKETCH_BITS, (2 * size_hint).bit_length()))
+        self._mask = (1 << bits) - 1
+        self._rows = (array('I', [0]) * (1 << bits), array('I', [0]) * (1 << bits))
+        self._candidates: Dict[bytes, int] = {}  # окно -> оценка количества
+
+    def _count_windows(self, windows: List[bytes], start: int) -> None:
+        row1, row2 = self._rows
+        mask = self._mask
+        candidates = self._candidates
+
+        # Цикл Python идет по различным окнам блока, а не по каждому окну
+        for window, count in Counter(windows).items():
+            h = hash(window)
+            i = h & mask
+            j = h >> 32 & mask
+            a = row1[i]
+            b = row2[j]
+            estimate = (a if a < b else b) + count
+            if a < estimate:
+                row1[i] = estimate
+            if b < estimate:
+                row2[j] = estimate
+            if estimate > 1:
+                candidates[window] = estimate
+
+        if len(candidates) > 2 * self.capacity:
+            self._candidates = dict(nlargest(self.capacity, candidates.items(), key=itemgetter(1)))
+
+    def candidates(self) -> List[bytes]:
+        """Кандидаты в повторы без последовательностей из одного повторяющегося байта."""
+        return [key for key in self._candidates if key.count(key[0]) != len(key)]
+
+
+class CandidateCounter(WindowScanner):
+    """
+    Второй проход поиска повторов: точное количество и первое вхождение
+    каждого кандидата RepeatFinder. Окна проверяются по множеству
+    кандидатов на уровне C (map + compress), цикл Python идет только
+    по вхождениям кандидатов.
+    """
+
+    def __init__(self, candidates: List[bytes], length: int):
+        super().__init__(length)
+        self._candidates = set(candidates)
+        self._counts: Counter = Counter()
+        self._first_offsets: Dict[bytes, int] = {}
+
+    def _count_windows(self, windows: List[bytes], start: int) -> None:
+        mask = list(map(self._candidates.__contains__, windows))
+        hits = list(compress(windows, mask))
+        if not hits:
+            return
+        self._counts.update(hits)
+        positions = list(compress(range(start, start + len(windows)), mask))
+        # Словарь из перевернутой последовательности хранит первое вхождение окна,
+        # уже известные первые вхождения при слиянии остаются
+        firsts = dict(zip(reversed(hits), reversed(positions)))
+        self._first_offsets = {**firsts, **self._first_offsets}
+
+    def top(self, limit: int) -> List[bytes]:
+        """До limit повторов по убыванию количества, при равенстве - более ранние."""
+        repeated = (key for key, count in self._counts.items() if count > 1)
+        return nsmallest(limit, repeated, key=lambda key: (-self._counts[key], self._first_offsets[key]))
+
+
+class RepeatCounter:
+    """
+    Третий проход поиска повторов: вхождения лучших кандидатов
+    (CandidateCounter.top) и их продолжений до max_length байтов.
+
+    Вхождения каждого кандидата ищутся bytes.find (на уровне C), для
+    каждого запоминаются следующие за ним байты (продолжение длиной до
+    max_length). Повтор длины L, начинающийся с кандидата, встречается
+    ровно столько раз, сколько продолжений начинается с него, поэтому
+    количества и смещения продолжений точные. Группы продолжений
+    наращиваются по одному байту; группа, которая уже не может попасть
+    в результат, отбрасывается вместе со всеми своими продолжениями.
+
+    Различных продолжений хранится не больше capacity; после этого новые
+    не запоминаются, а количества длинных повторов становятся нижними
+    оценками (флаг approximate). Количества самих кандидатов точные всегда.
+    """
+
+    # Сколько смещений хранится для каждого паттерна
+    MAX_OFFSETS = 10
+
+    def __init__(self, patterns: List[bytes], max_length: int, capacity: int = 200000):
+        self.patterns = patterns
+        self.max_length = max(max_length, max(map(len, patterns), default=0))
+        self.capacity = capacity
+        self.approximate = False
+
+        self._counts = {pattern: 0 for pattern in patterns}
+        self._offsets: Dict[bytes, List[int]] = {pattern: [] for pattern in patterns}
+        # Кандидат -> {продолжение: [количество, первые смещения]}
+        self._extensions: Dict[bytes, Dict[bytes, List]] = {pattern: {} for pattern in patterns}
+        self._stored = 0
+        self._carry = b''
+        self._carry_offset = 0
+        self._next_offset = 0
+
+    def feed(self, offset: int, chunk: bytes) -> None:
+        """Учет очередного чанка, начинающегося со смещения offset."""
+        if offset != self._next_offset:
+            # Разрыв (выборочный режим): продолжения обрезаются на конце блока
+            self._flush()
+            self._carry_offset = offset
+
+        buf = self._carry + chunk
+        # Вхождения в последних max_length - 1 байтах ждут следующего чанка
+        end = len(buf) - (self.max_length - 1)
+        if end > 0:
+            self._scan(buf, end)
+            self._carry = buf[end:]
+            self._carry_offset += end
+        else:
+            self._carry = buf
+        self._next_offset = offset + len(chunk)
+
+    def _flush(self) -> None:
+        if self._carry:
+            self._scan(self._carry, len(self._carry))
+            self._carry_offset += len(self._carry)
+            self._carry = b''
+
+    def _scan(self, buf: bytes, end: int) -> None:
+        """Вхождения кандидатов, начинающиеся в buf[:end]."""
+        base = self._carry_offset
+        max_length = self.max_length
+        for pattern in self.patterns:
+            offsets = self._offsets[pattern]
+            extensions = self._extensions[pattern]
+            count = 0
+            i = buf.find(pattern, 0, end + len(pattern) - 1)
+            while i != -1:
+                count += 1
+                offset = base + i
+                if len(offsets) < self.MAX_OFFSETS:
+                    offsets.append(offset)
+                extension = buf[i:i + max_length]
+                entry = extensions.get(extension)
+                if entry is not None:
+                    entry[0] += 1
+                    if len(entry[1]) < self.MAX_OFFSETS:
+                        entry[1].append(offset)
+                elif self._stored < self.capacity:
+                    extensions[extension] = [1, [offset]]
+                    self._stored += 1
+                else:
+                    self.approximate = True
+                i = buf.find(pattern, i + 1, end + len(pattern) - 1)
+            self._counts[pattern] += count
+
+    def result(self, max_patterns: int = 20, scale: float = 1.0) -> List[Dict]:
+        """
+        Самые частые повторы в формате BinaryAnalyzer.find_patterns:
+        по убыванию количества, при равенстве - сначала короткие и ранние.
+        scale > 1 - данные были выборкой: количество пересчитывается на весь
+        файл. Оценки (выборка или флаг approximate) помечаются 'approximate': True.
+        """
+        self._flush()
+        top: List[tuple] = []
+
+        def offer(pattern: bytes, count: int, offsets: List[int]) -> None:
+            item = (count, -len(pattern), -offsets[0], pattern, offsets)
+            if len(top) < max_patterns:
+                heappush(top, item)
+            elif item[:3] > top[0][:3]:
+                heapreplace(top, item)
+
+        def threshold() -> int:
+            # Количество, меньше которого повтор уже не попадет в результат
+            return top[0][0] if len(top) >= max_patterns else 2
+
+        if max_patterns <= 0:
+            return []
+        for pattern in sorted(self.patterns, key=self._counts.__getitem__, reverse=True):
+            if self._counts[pattern] < threshold():
+                break
+            offer(pattern, self._counts[pattern], self._offsets[pattern])
+
+            groups = [list(self._extensions[pattern].items())]
+            length = len(pattern)
+            while groups and length < self.max_length:
+                length += 1
+                next_groups = []
+                for entries in groups:
+                    split: Dict[bytes, List] = {}
+                    for extension, entry in entries:
+                        if len(extension) >= length:
+                            split.setdefault(extension[:length], []).append((extension, entry))
+                    for prefix, group in split.items():
+                        count = sum(entry[0] for _, entry in group)
+                        if count < threshold():
+                            continue
+                        offsets = nsmallest(self.MAX_OFFSETS, chain.from_iterable(entry[1] for _, entry in group))
+                        offer(prefix, count, offsets)
+                        next_groups.append(group)
+                groups = next_groups
+
+        top.sort(reverse=True)
+        repeated = [
+            {
+                'pattern': pattern.hex(),
+                'length': len(pattern),
+                'count': count,
+                'first_offset': offsets[0],
+                'offsets': offsets  # Показываем первые 10
+            }
+            for count, _, _, pattern, offsets in top
+        ]
+        if scale > 1.0 or self.approximate:
+            for item in repeated:
+                item['count'] = round(item['count'] * scale)
+                item['approximate'] = True
+        return repeated
+
+
+def find_repeats(chunks: Callable[[], Iterable[Tuple[int, bytes]]], min_length: int, max_length: int,
+                 max_patterns: int = 20, capacity: int = 200000, size_hint: Optional[int] = None,
+                 scale: float = 1.0) -> List[Dict]:
+    """
+    Поиск повторов за три прохода по данным: chunks() при каждом вызове
+    заново отдает те же пары (смещение, чанк). Результат - RepeatCounter.result.
+    """
+    finder = RepeatFinder(min_length, capacity, size_hint)
+    for offset, chunk in chunks():
+        finder.feed(offset, chunk)
+
+    counter = CandidateCounter(finder.candidates(), min_length)
+    del finder
+    for offset, chunk in chunks():
+        counter.feed(offset, chunk)
+
+    # Кандидатов берем с запасом: продолжения могут обогнать короткие повторы
+    top = counter.top(max_patterns * 2)
+    if not top:
+        return []
+    repeats = RepeatCounter(top, max_length, capacity)
+    for offset, chunk in chunks():
+        repeats.feed(offset, chunk)
+    return repeats.result(max_patterns, scale)
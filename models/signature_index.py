@@ -0,0 +1,84 @@
+from typing import Dict, Optional, Tuple, Union
+
+
+# Ключ сигнатуры: байты в начале файла или (смещение, байты)
+SignatureKey = Union[bytes, Tuple[int, bytes]]
+
+# Ключ узла бора, под которым хранится название типа (байты - это 0..255)
+_NAME = -1
+
+
+class SignatureIndex:
+    """
+    Индекс сигнатур файлов: байтовый бор для каждого смещения.
+    Заголовок проверяется за один проход по бору на смещение,
+    при нескольких совпадениях побеждает самая длинная сигнатура.
+    """
+
+    def __init__(self):
+        self._tries: Dict[int, dict] = {}
+        # Сколько байтов заголовка нужно прочитать, чтобы проверить все сигнатуры
+        self.header_size = 0
+
+    @classmethod
+    def from_dict(cls, signatures: Dict[SignatureKey, str]) -> 'SignatureIndex':
+        index = cls()
+        for key, name in signatures.items():
+            offset, signature = key if isinstance(key, tuple) else (0, key)
+            index.add(signature, name, offset)
+        return index
+
+    def add(self, signature: bytes, name: str, offset: int = 0) -> None:
+        """Добавление сигнатуры, расположенной по смещению offset."""
+        if not signature:
+            raise ValueError("Сигнатура не может быть пустой.")
+        node = self._tries.setdefault(offset, {})
+        for byte in signature:
+            node = node.setdefault(byte, {})
+        node[_NAME] = name
+        self.header_size = max(self.header_size, offset + len(signature))
+
+    def match(self, header: bytes) -> Optional[str]:
+        """Тип файла по самой длинной совпавшей сигнатуре или None."""
+        best_name = None
+        best_length = 0
+        for offset, node in self._tries.items():
+            length = 0
+            for byte in header[offset:]:
+                node = node.get(byte)
+                if node is None:
+                    break
+                length += 1
+                if _NAME in node and length > best_length:
+                    best_name = node[_NAME]
+                    best_length = length
+        return best_name
+
+    @staticmethod
+    def parse_file(path: str, encoding: str = 'utf-8') -> Dict[SignatureKey, str]:
+        """
+        Чтение сигнатур из текстового файла.
+        Формат строки: [смещение:]hex-байты = Название, '#' - комментарий.
+        """
+        signatures = {}
+        with open(path, mode='r', encoding=encoding) as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if '=' not in line:
+                    raise ValueError(f"{path}:{line_no}: ожидается 'сигнатура = название'")
+                key, name = line.split('=', 1)
+                key = key.strip()
+                offset = 0
+                if ':' in key:
+                    offset_str, key = key.split(':', 1)
+                    offset = int(offset_str.strip(), 0)
+                try:
+                    signature = bytes.fromhex(key)
+                except ValueError:
+                    raise ValueError(f"{path}:{line_no}: неверная hex-строка") from None
+                if not signature:
+                    raise ValueError(f"{path}:{line_no}: пустая сигнатура")
+                signatures[(offset, signature) if offset else signature] = name.strip()
+        return signatures
@@ -0,0 +1,140 @@
+import math
+import os
+import random
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .binary_file import _pread
+from .byte_histogram import entropy_of
+
+
+# Квантиль нормального распределения для 95% доверительного интервала
+Z_95 = 1.96
+
+
+class StructureEstimator:
+    """
+    Приближенный анализ структуры по выборке блоков.
+    Читается фиксированное число блоков (os.pread), поэтому время работы
+    не зависит от размера файла. Блоки выбираются случайно или по слоям
+    (файл делится на равные слои, в каждом - один блок в случайном месте).
+
+    Доверительные интервалы (95%) строятся по разбросу между блоками:
+    для долей - как для кластерной выборки, для энтропии - методом
+    складного ножа (jackknife) с исключением одного блока.
+    """
+
+    def __init__(self, path: str, blocks: int = 256, block_size: int = 16 * 1024,
+                 sampling: str = 'stratified', seed: Optional[int] = None):
+        if sampling not in ('stratified', 'random'):
+            raise ValueError("Способ выборки: 'stratified' или 'random'.")
+        if blocks <= 1 or block_size <= 0:
+            raise ValueError("Нужно не меньше двух блоков положительного размера.")
+        self.path = path
+        self.blocks = blocks
+        self.block_size = block_size
+        self.sampling = sampling
+        self._random = random.Random(seed)
+
+    def covers_file(self, size: int) -> bool:
+        """Выборка не меньше файла - выгоднее точный анализ."""
+        return size <= self.blocks * self.block_size
+
+    def _offsets(self, size: int) -> List[int]:
+        last = size - self.block_size
+        if self.sampling == 'random':
+            return sorted(self._random.randint(0, last) for _ in range(self.blocks))
+        stratum = size / self.blocks
+        return [
+            min(last, int(i * stratum) + self._random.randint(0, max(0, int(stratum) - self.block_size)))
+            for i in range(self.blocks)
+        ]
+
+    def sample(self) -> Tuple[int, List[Counter], List[bytes]]:
+        """Чтение выборки: размер файла, гистограммы блоков и сами блоки."""
+        size = os.path.getsize(self.path)
+        fd = os.open(self.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            data = [_pread(fd, self.block_size, offset) for offset in self._offsets(size)]
+        finally:
+            os.close(fd)
+        return size, [Counter(block) for block in data], data
+
+    def estimate(self, classify_block: Callable[[bytes, float], str]) -> Dict:
+        """
+        Оценки распределения байтов, энтропии, доли нулей и состава файла.
+        classify_block(блок, энтропия) возвращает класс содержимого блока.
+        """
+        size, histograms, data = self.sample()
+        k = len(histograms)
+        lengths = [len(block) for block in data]
+        sampled = sum(lengths)
+        # Поправка на конечность совокупности (доля файла, попавшая в выборку)
+        fpc = max(0.0, 1.0 - sampled / size) if size else 0.0
+
+        totals = Counter()
+        for histogram in histograms:
+            totals.update(histogram)
+        counts = [totals.get(byte, 0) for byte in range(256)]
+
+        def ratio_interval(values: List[int]) -> Tuple[float, float, float]:
+            """Оценка доли и интервал по значениям в блоках (кластерная выборка)."""
+            ratio = sum(values) / sampled
+            residuals = [v - ratio * n for v, n in zip(values, lengths)]
+            mean_length = sampled / k
+            variance = sum(r * r for r in residuals) / (k - 1) / (k * mean_length ** 2) * fpc
+            margin = Z_95 * math.sqrt(variance)
+            return ratio, max(0.0, ratio - margin), min(1.0, ratio + margin)
+
+        # Энтропия: jackknife по блокам
+        entropy = entropy_of(counts, sampled)
+        partial = []
+        for histogram, length in zip(histograms, lengths):
+            rest = [counts[byte] - histogram.get(byte, 0) for byte in range(256)]
+            partial.append(entropy_of(rest, sampled - length))
+        mean_partial = sum(partial) / k
+        entropy_se = math.sqrt((k - 1) / k * sum((p - mean_partial) ** 2 for p in partial) * fpc)
+
+        null_ratio, null_low, null_high = ratio_interval([h.get(0, 0) for h in histograms])
+
+        most_common = []
+        for byte, count in totals.most_common(10):
+            ratio, low, high = ratio_interval([h.get(byte, 0) for h in histograms])
+            most_common.append({
+                'byte': f"0x{byte:02X}",
+                'decimal': byte,
+                'ascii': chr(byte) if 32 <= byte <= 126 else '.',
+                'count': round(ratio * size),
+                'percentage': ratio * 100,
+                'percentage_ci': (low * 100, high * 100)
+            })
+
+        # Состав файла: доля блоков каждого класса
+        kinds = [classify_block(block, entropy_of([h.get(b, 0) for b in range(256)], len(block)))
+                 for block, h in zip(data, histograms)]
+        composition = []
+        for kind, hits in Counter(kinds).most_common():
+            ratio = hits / k
+            margin = Z_95 * math.sqrt(ratio * (1 - ratio) / k * fpc)
+            composition.append({
+                'kind': kind,
+                'percentage': ratio * 100,
+                'percentage_ci': (max(0.0, ratio - margin) * 100, min(1.0, ratio + margin) * 100)
+            })
+
+        return {
+            'approximate': True,
+            'size': size,
+            'sampled_blocks': k,
+            'sampled_bytes': sampled,
+            'total_bytes': size,
+            # В выборке встречены не все байты файла: это нижняя граница
+            'unique_bytes': len(totals),
+            'entropy': entropy,
+            'entropy_ci': (max(0.0, entropy - Z_95 * entropy_se), min(8.0, entropy + Z_95 * entropy_se)),
+            'most_common_bytes': most_common,
+            'null_bytes': round(null_ratio * size),
+            'null_percentage': null_ratio * 100,
+            'null_percentage_ci': (null_low * 100, null_high * 100),
+            'composition': composition
+        }
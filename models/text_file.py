@@ -1,6 +1,10 @@
+import io
 import os
-from typing import Generator, Optional, Tuple
-import tempfile
+from itertools import islice
+from typing import Generator, Iterable, List, Optional, Tuple
+
+from .line_index import LineIndex
+from .text_replacer import ReplaceRule, TextReplacer
 
 
 class FileExistsErrorCustom(Exception):
@@ -13,6 +17,9 @@ class TextFile:
     Класс для работы с текстовым файлом.
     """
 
+    # Файлы меньше этого размера листаются последовательно, без <файл>.lidx
+    INDEX_MIN_SIZE = 4 * 1024 * 1024
+
     def __init__(self, path: str):
         self.path = path
 
@@ -25,14 +32,21 @@ class TextFile:
         with open(self.path, mode='w', encoding=encoding, newline='') as f:
             if initial_text:
                 f.write(initial_text)
+        LineIndex.remove(self.path)
 
     def append(self, text: str, encoding: str = 'utf-8') -> None:
+        # Актуальный индекс строк дополняется только дописанной частью
+        index = LineIndex.load(self.path)
         with open(self.path, mode='a', encoding=encoding, newline='') as f:
             f.write(text)
+        if index is not None:
+            index.update()
+            index.save()
 
     def clear(self, encoding: str = 'utf-8') -> None:
         with open(self.path, mode='w', encoding=encoding) as f:
             pass
+        LineIndex.remove(self.path)
 
     def read_lines(self, encoding: str = 'utf-8', errors: str = 'strict') -> Generator[str, None, None]:
         with open(self.path, mode='r', encoding=encoding, errors=errors) as f:
@@ -53,41 +67,62 @@ class TextFile:
         if page:
             yield (start_line, page)
 
-    def search_and_replace(self, find_text: str, replace_text: str, encoding: str = 'utf-8', case_sensitive: bool = True) -> int:
+    @staticmethod
+    def index_supported(encoding: str) -> bool:
+        """Индекс строк ищет байт '\\n', поэтому нужна кодировка, совместимая с ASCII."""
+        return '\n\n'.encode(encoding).endswith(b'\n\n')
+
+    def should_index(self, encoding: str) -> bool:
+        """Стоит ли строить индекс строк: кодировка подходит и файл не меньше INDEX_MIN_SIZE."""
+        return self.index_supported(encoding) and os.path.getsize(self.path) >= self.INDEX_MIN_SIZE
+
+    def line_index(self, step: int = LineIndex.DEFAULT_STEP) -> LineIndex:
+        """Индекс смещений строк (загружается из <файл>.lidx или строится заново)."""
+        return LineIndex.open(self.path, step)
+
+    def read_lines_at(self, start_line: int, count: int, encoding: str = 'utf-8', errors: str = 'strict',
+                      index: Optional[LineIndex] = None) -> List[str]:
+        """
+        Чтение count строк, начиная со строки start_line (нумерация с 1).
+        С индексом чтение начинается сразу с нужного смещения файла.
+        """
+        if index is None or not self.index_supported(encoding):
+            return list(islice(self.read_lines(encoding=encoding, errors=errors), start_line - 1, start_line - 1 + count))
+
+        offset = index.locate(start_line - 1)
+        chunks = []
+        with open(self.path, mode='rb') as f:
+            f.seek(offset)
+            newlines = 0
+            while newlines < count and (chunk := f.read(64 * 1024)):
+                chunks.append(chunk)
+                newlines += chunk.count(b'\n')
+        with io.TextIOWrapper(io.BytesIO(b''.join(chunks)), encoding=encoding, errors=errors) as text:
+            return [line.rstrip('\n') for line in islice(text, count)]
+
+    def read_page(self, page: int, lines_per_page: int = 25, encoding: str = 'utf-8', errors: str = 'strict',
+                  index: Optional[LineIndex] = None) -> Tuple[int, list]:
+        """Страница page (нумерация с 1) в том же виде, что и у read_paged: (номер первой строки, строки)."""
+        start_line = (page - 1) * lines_per_page + 1
+        return start_line, self.read_lines_at(start_line, lines_per_page, encoding, errors, index)
+
+    def search_and_replace(self, find_text: str, replace_text: str, encoding: str = 'utf-8', case_sensitive: bool = True,
+                           parallel: bool = False, workers: Optional[int] = None) -> int:
         """
         Поиск и замена текста.
         Теперь безопасно работает на разных дисках (Windows).
+        parallel - обработка диапазонов строк большого файла в пуле процессов.
         """
-        replacements = 0
-
-        # создаём временный файл в той же папке, что и исходный файл
-        dir_name = os.path.dirname(os.path.abspath(self.path))
-        with tempfile.NamedTemporaryFile('w', delete=False, encoding=encoding, newline='', dir=dir_name) as tmp:
-            tmppath = tmp.name
-            for line in self.read_lines(encoding=encoding):
-                original = line
-                if case_sensitive:
-                    new_line = original.replace(find_text, replace_text)
-                    count = original.count(find_text)
-                else:
-                    lowered = original.lower()
-                    target = find_text.lower()
-                    count = lowered.count(target)
-                    parts = []
-                    i = 0
-                    lo = original.lower()
-                    while True:
-                        idx = lo.find(target, i)
-                        if idx == -1:
-                            parts.append(original[i:])
-                            break
-                        parts.append(original[i:idx])
-                        parts.append(replace_text)
-                        i = idx + len(target)
-                    new_line = ''.join(parts)
-                replacements += count
-                tmp.write(new_line + '\n')
-
-        # безопасная замена файла
-        os.replace(tmppath, self.path)
-        return replacements
+        rule = ReplaceRule(find_text, replace_text, case_sensitive=case_sensitive)
+        return self.replace_many([rule], encoding=encoding, parallel=parallel, workers=workers)[0]
+
+    def replace_many(self, rules: Iterable[ReplaceRule], encoding: str = 'utf-8',
+                     parallel: bool = False, workers: Optional[int] = None) -> List[int]:
+        """Применение нескольких правил замены за один проход; количество замен по каждому правилу."""
+        replacer = TextReplacer(rules)
+        if parallel:
+            counts = replacer.replace_file_parallel(self.path, encoding=encoding, workers=workers)
+        else:
+            counts = replacer.replace_file(self.path, encoding=encoding)
+        LineIndex.remove(self.path)
+        return counts
@@ -0,0 +1,384 @@
+import os
+import re
+import shutil
+import tempfile
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from .parallel_ranges import RANGES_PER_WORKER, pool_size, split_bounds
+
+
+class ReplaceRule:
+    """Правило замены: строка или регулярное выражение и замена для него."""
+
+    def __init__(self, find: str, replace: str, regex: bool = False, case_sensitive: bool = True):
+        if not find:
+            raise ValueError("Строка поиска не может быть пустой.")
+        self.find = find
+        self.replace = replace
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        flags = 0 if case_sensitive else re.IGNORECASE
+        # Отдельно скомпилированное правило нужно для подстановки групп (\1, \g<name>)
+        self.pattern = re.compile(find if regex else re.escape(find), flags)
+
+    def __repr__(self) -> str:
+        kind = 're' if self.regex else 'str'
+        return f"ReplaceRule({kind}:{self.find!r} -> {self.replace!r})"
+
+
+def _replace_range(rules: List[ReplaceRule], path: str, encoding: str, start: int, end: int,
+                   dir_name: str) -> Tuple[str, List[int]]:
+    """
+    Замена в диапазоне [start, end) файла, выровненном по границам строк
+    (выполняется в отдельном процессе). Результат - во временном файле в dir_name;
+    возвращает путь к нему и количество замен по правилам.
+    """
+    replacer = TextReplacer(rules)
+    with open(path, mode='rb') as src, \
+            tempfile.NamedTemporaryFile('w', delete=False, encoding=encoding, newline='', dir=dir_name) as tmp:
+        tmppath = tmp.name
+        try:
+            src.seek(start)
+            remaining = end - start
+            pending: List[bytes] = []
+            while remaining > 0:
+                data = src.read(min(replacer.BLOCK_SIZE, remaining))
+                remaining = remaining - len(data) if data else 0
+                # Блок из целых строк: '\r\n' и многобайтовые символы не разрываются
+                cut = data.rfind(b'\n') + 1 if remaining else len(data)
+                if not cut and data:
+                    pending.append(data)
+                    continue
+                pending.append(data[:cut])
+                block = b''.join(pending)
+                pending = [data[cut:]]
+                if block:
+                    # Перевод строк как при чтении в текстовом режиме
+                    text = block.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+                    tmp.write(replacer.replace_block(text))
+        except BaseException:
+            tmp.close()
+            os.remove(tmppath)
+            raise
+    return tmppath, replacer.counts
+
+
+class TextReplacer:
+    """
+    Применение множества правил замены за один проход.
+    Все правила объединяются в одно регулярное выражение-альтернативу
+    с именованной группой на правило: в каждой позиции срабатывает
+    первое по порядку подходящее правило, счетчики ведутся по правилам.
+
+    Текст обрабатывается блоками целых строк; правила не выходят за
+    границу строки (если среди правил есть регулярные выражения, замена
+    выполняется построчно внутри блока, для строк - сразу на весь блок).
+    """
+
+    BLOCK_SIZE = 1024 * 1024
+
+    # Глобальные флаги в начале выражения правила: (?i), (?ms) ...
+    _LEADING_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+    # Ссылки на группы внутри выражения: (?P<имя>, (?P=имя), (?(имя или номер)
+    _GROUP_REF = re.compile(r'\(\?(P<|P=|\()(\w+)')
+    # Экранирование после '\': восьмеричный код из трех цифр или номер группы
+    _ESCAPE = re.compile(r'[0-7]{3}|[1-9]\d?')
+
+    def __init__(self, rules: Iterable[ReplaceRule]):
+        self.rules: List[ReplaceRule] = list(rules)
+        if not self.rules:
+            raise ValueError("Нужно хотя бы одно правило.")
+        self.counts = [0] * len(self.rules)
+        # Строковое правило с '\n' не должно совпадать через границу строк
+        self._line_mode = any(rule.regex or '\n' in rule.find for rule in self.rules)
+
+        parts = []
+        groups = 0
+        for i, rule in enumerate(self.rules):
+            if rule.regex:
+                # В общем выражении группы правила сдвигаются на число групп перед ним
+                source = self._scope_flags(self._rewrite_groups(rule, i, groups + 1))
+            else:
+                source = re.escape(rule.find)
+            if not rule.case_sensitive:
+                source = f"(?i:{source})"
+            parts.append(f"(?P<_r{i}>{source})")
+            groups += 1 + rule.pattern.groups
+        # Если правила не объединяются, каждое ищется отдельно (_replace_separately)
+        try:
+            self._combined: Optional[re.Pattern] = re.compile('|'.join(parts))
+        except re.error:
+            self._combined = None
+        if self._combined is not None and self._combined.groups != groups:
+            self._combined = None
+        # Шаблон для re.subn единственного строкового правила ('\\' в замене - литерал)
+        self._template = self.rules[0].replace.replace('\\', '\\\\')
+
+    @classmethod
+    def _rewrite_groups(cls, rule: ReplaceRule, index: int, shift: int) -> str:
+        """
+        Выражение правила для общей альтернативы: номерные ссылки (\\1, (?(1)...))
+        сдвигаются на shift, именованные группы и ссылки на них получают
+        префикс правила. Классы символов, экранирование и комментарии
+        режима VERBOSE копируются без изменений.
+        """
+        source = rule.find
+        verbose = bool(rule.pattern.flags & re.VERBOSE)
+        prefix = f"_r{index}_"
+        out = []
+        i, n = 0, len(source)
+        while i < n:
+            c = source[i]
+            if c == '\\':
+                match = cls._ESCAPE.match(source, i + 1)
+                if match and len(match.group()) < 3:
+                    out.append(f"(?:\\{int(match.group()) + shift})")
+                    i = match.end()
+                else:
+                    out.append(source[i:i + 2])
+                    i += 2
+                continue
+            if c == '[':
+                j = i + 1
+                if source.startswith('^', j):
+                    j += 1
+                if source.startswith(']', j):
+                    j += 1
+                while j < n and source[j] != ']':
+                    j += 2 if source[j] == '\\' else 1
+                out.append(source[i:j + 1])
+                i = j + 1
+                continue
+            if c == '#' and verbose:
+                j = source.find('\n', i)
+                j = n if j == -1 else j
+                out.append(source[i:j])
+                i = j
+                continue
+            match = cls._GROUP_REF.match(source, i)
+            if match:
+                kind, name = match.groups()
+                name = str(int(name) + shift) if name.isdigit() else prefix + name
+                out.append(f"(?{kind}{name}")
+                i = match.end()
+                continue
+            out.append(c)
+            i += 1
+        return ''.join(out)
+
+    @classmethod
+    def _scope_flags(cls, source: str) -> str:
+        """Глобальные флаги из начала выражения переносятся в группу (?флаги:...)."""
+        flags = ''
+        while match := cls._LEADING_FLAGS.match(source):
+            flags += match.group(1)
+            source = source[match.end():]
+        if not flags:
+            return source
+        # В режиме VERBOSE '#' в конце выражения закомментировал бы ')'
+        tail = '\n' if 'x' in flags else ''
+        return f"(?{''.join(dict.fromkeys(flags))}:{source}{tail})"
+
+    @classmethod
+    def parse_rules(cls, path: str, encoding: str = 'utf-8') -> List[ReplaceRule]:
+        """
+        Чтение правил из файла. Формат строки: [флаги:]найти => заменить,
+        флаги: r - регулярное выражение, i - без учета регистра; '#' - комментарий.
+        """
+        rules = []
+        with open(path, mode='r', encoding=encoding) as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.rstrip('\r\n')
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                if ' => ' not in line:
+                    raise ValueError(f"{path}:{line_no}: ожидается 'найти => заменить'")
+                find, replace = line.split(' => ', 1)
+                flags = ''
+                match = re.match(r'([ri]{1,2}):', find)
+                if match:
+                    flags = match.group(1)
+                    find = find[match.end():]
+                try:
+                    rules.append(ReplaceRule(find, replace, regex='r' in flags, case_sensitive='i' not in flags))
+                except (ValueError, re.error) as e:
+                    raise ValueError(f"{path}:{line_no}: {e}") from None
+        return rules
+
+    def _substitute(self, match: re.Match) -> str:
+        index = int(match.lastgroup[2:])
+        self.counts[index] += 1
+        rule = self.rules[index]
+        if not rule.regex:
+            return rule.replace
+        # Подстановка групп по собственному выражению правила
+        return rule.pattern.match(match.string, match.start()).expand(rule.replace)
+
+    def replace(self, text: str) -> str:
+        """Замена в тексте из целых строк; счетчики накапливаются в self.counts."""
+        if len(self.rules) == 1 and not self._line_mode:
+            rule = self.rules[0]
+            if rule.case_sensitive:
+                # Одна строка с учетом регистра: count/replace целиком на уровне C
+                self.counts[0] += text.count(rule.find)
+                return text.replace(rule.find, rule.replace)
+            # Без обратного вызова на каждое совпадение: замена - готовый шаблон
+            text, count = rule.pattern.subn(self._template, text)
+            self.counts[0] += count
+            return text
+        if self._combined is None:
+            sub = self._replace_separately
+        else:
+            sub = partial(self._combined.sub, self._substitute)
+        if not self._line_mode:
+            return sub(text)
+        return '\n'.join([sub(line) for line in text.split('\n')])
+
+    def _replace_separately(self, text: str) -> str:
+        """
+        Замена без общего выражения: в каждой позиции ищется самое левое
+        совпадение среди правил, при равенстве - первое по порядку правило.
+        """
+        out = []
+        pos = 0
+        matches = [rule.pattern.search(text) for rule in self.rules]
+        while True:
+            best = None
+            for index, rule in enumerate(self.rules):
+                match = matches[index]
+                if match is not None and match.start() < pos:
+                    match = matches[index] = rule.pattern.search(text, pos)
+                if match is not None and (best is None or match.start() < matches[best].start()):
+                    best = index
+            if best is None:
+                break
+            match = matches[best]
+            self.counts[best] += 1
+            out.append(text[pos:match.start()])
+            out.append(match.expand(self.rules[best].replace) if self.rules[best].regex else self.rules[best].replace)
+            pos = match.end()
+            if match.end() == match.start():
+                # Пустое совпадение: следующий поиск - со следующего символа
+                out.append(text[pos:pos + 1])
+                pos += 1
+                matches[best] = None if pos > len(text) else self.rules[best].pattern.search(text, pos)
+            if pos > len(text):
+                break
+        out.append(text[pos:])
+        return ''.join(out)
+
+    def replace_block(self, block: str) -> str:
+        """Замена в блоке целых строк; каждая строка результата заканчивается '\n'."""
+        if not block.endswith('\n'):
+            block += '\n'
+        return self.replace(block[:-1]) + '\n'
+
+    def replace_file(self, path: str, encoding: str = 'utf-8', output_path: Optional[str] = None) -> List[int]:
+        """
+        Замена в файле блоками целых строк. Результат пишется во временный
+        файл в том же каталоге и атомарно заменяет output_path (по умолчанию - исходный).
+        Возвращает количество замен по каждому правилу.
+        """
+        output_path = output_path or path
+        self.counts = [0] * len(self.rules)
+        dir_name = os.path.dirname(os.path.abspath(output_path))
+        with open(path, mode='r', encoding=encoding) as src, \
+                tempfile.NamedTemporaryFile('w', delete=False, encoding=encoding, newline='', dir=dir_name) as tmp:
+            tmppath = tmp.name
+            try:
+                while lines := src.readlines(self.BLOCK_SIZE):
+                    # Каждая строка заканчивается '\n', как при построчной записи
+                    tmp.write(self.replace_block(''.join(lines)))
+            except BaseException:
+                tmp.close()
+                os.remove(tmppath)
+                raise
+
+        os.replace(tmppath, output_path)
+        return list(self.counts)
+
+    @staticmethod
+    def splittable(encoding: str) -> bool:
+        """Файл можно резать по байту '\n': кодировка совместима с ASCII и без BOM."""
+        return '\n\n'.encode(encoding) == b'\n\n'
+
+    @staticmethod
+    def line_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+        """Деление файла на parts диапазонов байтов; каждый заканчивается сразу после '\n'."""
+        size = os.path.getsize(path)
+        bounds = [0]
+        with open(path, mode='rb') as f:
+            for target in split_bounds(size, parts)[1:-1]:
+                target = max(bounds[-1], target)
+                f.seek(target)
+                # Граница - после первого '\n' не раньше target
+                pos = target
+                while chunk := f.read(64 * 1024):
+                    idx = chunk.find(b'\n')
+                    if idx != -1:
+                        pos += idx + 1
+                        break
+                    pos += len(chunk)
+                if pos >= size:
+                    break
+                if pos > bounds[-1]:
+                    bounds.append(pos)
+        bounds.append(size)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def replace_file_parallel(self, path: str, encoding: str = 'utf-8', output_path: Optional[str] = None,
+                              workers: Optional[int] = None) -> List[int]:
+        """
+        Параллельная замена: файл делится на диапазоны по границам строк,
+        каждый обрабатывается в пуле процессов в свой временный файл,
+        затем части склеиваются и атомарно заменяют output_path.
+        Результат и счетчики совпадают с replace_file.
+        """
+        workers = pool_size(os.path.getsize(path), workers)
+        if workers == 1 or not self.splittable(encoding):
+            return self.replace_file(path, encoding, output_path)
+
+        output_path = output_path or path
+        dir_name = os.path.dirname(os.path.abspath(output_path))
+        ranges = self.line_ranges(path, workers * RANGES_PER_WORKER)
+        counts = [0] * len(self.rules)
+        futures = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_replace_range, self.rules, path, encoding, start, end, dir_name)
+                    for start, end in ranges
+                ]
+                try:
+                    parts = []
+                    for future in futures:
+                        tmppath, part_counts = future.result()
+                        parts.append(tmppath)
+                        counts = [a + b for a, b in zip(counts, part_counts)]
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            # Склейка: остальные части дописываются в первую
+            with open(parts[0], mode='ab') as out:
+                for part in parts[1:]:
+                    with open(part, mode='rb') as f:
+                        shutil.copyfileobj(f, out, self.BLOCK_SIZE)
+            os.replace(parts[0], output_path)
+        except BaseException:
+            # После выхода из пула задачи завершены или отменены: удаляем их части
+            for future in futures:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    try:
+                        os.remove(future.result()[0])
+                    except OSError:
+                        pass
+            raise
+        for part in parts[1:]:
+            os.remove(part)
+
+        self.counts = counts
+        return list(counts)
@@ -1,12 +1,20 @@
 from models.text_file import TextFile
+from models.text_replacer import TextReplacer
+from models.parallel_ranges import PARALLEL_THRESHOLD
 from models.file_converter import FileConverter
 from models.text_analyzer import TextAnalyzer
 from models.binary_file import BinaryFile
-from models.hex_viewer import HexViewer
+from models.hex_viewer import HexNavigator, HexViewer
 from models.binary_analyzer import BinaryAnalyzer
+from models.byte_transforms import TransformPipeline
+from models.binary_delta import BinaryDelta
+from models.checksum_cache import ChecksumCache
 from models.performance_comparator import PerformanceComparator
 from models.config_loader import ConfigLoader
 import os
+import re
+import sys
+from itertools import islice
 
 
 class CLI:
@@ -14,6 +22,7 @@ class CLI:
 
     def __init__(self):
         self.running = True
+        self.checksum_cache = ChecksumCache()
 
     def prompt(self, text: str) -> str:
         try:
@@ -62,7 +71,7 @@ class CLI:
         if not filename:
             print("Файл не указан.")
             return None
-        return BinaryFile(filename)
+        return BinaryFile(filename, checksum_cache=self.checksum_cache)
 
     # ===== Текстовые файлы =====
 
@@ -90,13 +99,49 @@ class CLI:
         encoding = self.prompt("Кодировка (по умолчанию utf-8): ").strip() or 'utf-8'
         lines_per_page_str = self.prompt("Строк на страницу (по умолчанию 25): ").strip()
         lines_per_page = int(lines_per_page_str) if lines_per_page_str.isdigit() else 25
+        if lines_per_page < 1:
+            print("Число строк должно быть не меньше 1, используется 25.")
+            lines_per_page = 25
+
+        if not tf.should_index(encoding):
+            # Небольшой файл или кодировка, не совместимая с ASCII (UTF-16 и т.п.), -
+            # последовательное чтение без файла индекса
+            for start_line, page in tf.read_paged(lines_per_page=lines_per_page, encoding=encoding, errors='replace'):
+                for i, line in enumerate(page, start=start_line):
+                    print(f"{i:6}: {line}")
+                cont = self.prompt("-- Enter для продолжения, 'q' для выхода: ").strip().lower()
+                if cont == 'q':
+                    break
+            return
 
-        for start_line, page in tf.read_paged(lines_per_page=lines_per_page, encoding=encoding, errors='replace'):
-            for i, line in enumerate(page, start=start_line):
+        index = tf.line_index()
+        pages = max(1, -(-index.line_count // lines_per_page))
+        page = 1
+        while True:
+            start_line, lines = tf.read_page(page, lines_per_page, encoding, errors='replace', index=index)
+            for i, line in enumerate(lines, start=start_line):
                 print(f"{i:6}: {line}")
-            cont = self.prompt("-- Enter для продолжения, 'q' для выхода: ").strip().lower()
-            if cont == 'q':
+            print(f"-- Страница {page}/{pages}")
+            command = self.prompt(
+                "-- Enter - далее, p - назад, n <страница>, g <строка>, q - выход: "
+            ).strip().lower()
+            action, _, arg = command.partition(' ')
+
+            if action == '':
+                if page >= pages:
+                    break
+                page += 1
+            elif action == 'q':
                 break
+            elif action == 'p':
+                page = max(1, page - 1)
+            elif action in ('n', 'g') and arg.strip().isdigit():
+                number = int(arg)
+                if action == 'g':
+                    number = (number - 1) // lines_per_page + 1
+                page = min(max(1, number), pages)
+            else:
+                print("Неизвестная команда.")
 
     def append_flow(self):
         tf = self.choose_file()
@@ -130,13 +175,47 @@ class CLI:
             print("Файл не найден.")
             return
         find_text = self.prompt("Найти: ")
+        if not find_text:
+            print("Строка поиска не может быть пустой.")
+            return
         replace_text = self.prompt("Заменить на: ")
         encoding = self.prompt("Кодировка (по умолчанию utf-8): ").strip() or 'utf-8'
         cs = self.prompt("Учитывать регистр? (Y/n): ").strip().lower()
         case_sensitive = not (cs == 'n')
-        replacements = tf.search_and_replace(find_text, replace_text, encoding=encoding, case_sensitive=case_sensitive)
+        parallel = self.ask_parallel(tf)
+        replacements = tf.search_and_replace(find_text, replace_text, encoding=encoding,
+                                             case_sensitive=case_sensitive, parallel=parallel)
         print(f"Сделано замен: {replacements}")
 
+    def ask_parallel(self, tf: TextFile) -> bool:
+        """Параллельный режим предлагается только для больших файлов."""
+        if os.path.getsize(tf.path) < PARALLEL_THRESHOLD:
+            return False
+        answer = self.prompt("Обработать параллельно на всех ядрах? (Y/n): ").strip().lower()
+        return answer != 'n'
+
+    def replace_rules_flow(self):
+        tf = self.choose_file()
+        if not tf or not tf.exists():
+            print("Файл не найден.")
+            return
+        rules_path = self.prompt("Файл правил (строки вида [r|i|ri:]найти => заменить): ").strip()
+        if not rules_path:
+            print("Файл правил не указан.")
+            return
+        encoding = self.prompt("Кодировка (по умолчанию utf-8): ").strip() or 'utf-8'
+
+        try:
+            rules = TextReplacer.parse_rules(rules_path, encoding=encoding)
+            counts = tf.replace_many(rules, encoding=encoding, parallel=self.ask_parallel(tf))
+        except (OSError, ValueError, re.error) as e:
+            print(f"Ошибка: {e}")
+            return
+
+        for rule, count in zip(rules, counts):
+            print(f"  {rule!r}: {count}")
+        print(f"Всего замен: {sum(counts)}")
+
     def analyze_flow(self):
         tf = self.choose_file()
         if not tf or not tf.exists():
@@ -197,7 +276,7 @@ class CLI:
         viewer = HexViewer(bf, bytes_per_line=16)
 
         # Показываем информацию о файле
-        info = viewer.get_file_info()
+        info = viewer.get_file_info(threaded=True)
         print(f"\n=== Информация о файле ===")
         print(f"Путь: {info['path']}")
         print(f"Размер: {info['size_formatted']}")
@@ -208,13 +287,55 @@ class CLI:
 
         lines_per_page_str = self.prompt("Строк на страницу (по умолчанию 16): ").strip()
         lines_per_page = int(lines_per_page_str) if lines_per_page_str.isdigit() else 16
-
-        for offset, page in viewer.view_all_paged(lines_per_page):
-            for line in page:
-                print(line)
-            cont = self.prompt("-- Enter для продолжения, 'q' для выхода: ").strip().lower()
-            if cont == 'q':
-                break
+        if lines_per_page < 1:
+            print("Число строк должно быть не меньше 1, используется 16.")
+            lines_per_page = 16
+
+        with HexNavigator(viewer, lines_per_page) as nav:
+            lines = nav.lines()
+            while True:
+                if lines is not None:
+                    for line in lines:
+                        print(line)
+                print(f"-- Страница {nav.page + 1}/{nav.page_count}")
+                command = self.prompt(
+                    "-- Enter - далее, p - назад, g <смещение>, n <страница>, b - вернуться, "
+                    "/ <hex> - искать вперед, ? <hex> - искать назад, q - выход: "
+                ).strip()
+                action, _, arg = command.partition(' ')
+                action = action.lower()
+                arg = arg.strip()
+
+                try:
+                    if action == '':
+                        lines = nav.next_page()
+                        if lines is None:
+                            break
+                    elif action == 'q':
+                        break
+                    elif action == 'p':
+                        lines = nav.prev_page()
+                    elif action == 'g':
+                        lines = nav.goto(int(arg, 0))
+                    elif action == 'n':
+                        lines = nav.goto_page(int(arg) - 1)
+                    elif action == 'b':
+                        lines = nav.back()
+                    elif action in ('/', '?'):
+                        pattern = bytes.fromhex(arg)
+                        found = nav.search_forward(pattern) if action == '/' else nav.search_backward(pattern)
+                        if found is None:
+                            print("Паттерн не найден.")
+                            lines = None
+                        else:
+                            print(f"Найдено на offset 0x{found:08X} ({found})")
+                            lines = nav.lines()
+                    else:
+                        print("Неизвестная команда.")
+                        lines = None
+                except ValueError:
+                    print("Ошибка: неверное число или hex-строка")
+                    lines = None
 
     def binary_search_flow(self):
         bf = self.choose_binary_file()
@@ -248,11 +369,51 @@ class CLI:
         if show_context == 'y':
             viewer = HexViewer(bf)
             results = viewer.search_and_highlight(pattern, context_lines=2)
-            for result in results[:5]:
-                print(f"\n--- Найдено на offset 0x{result['offset']:08X} ---")
+            for result in islice(results, 5):
+                if len(result['offsets']) > 1:
+                    print(f"\n--- Найдено на offset 0x{result['offset']:08X} "
+                          f"(совпадений в блоке: {len(result['offsets'])}) ---")
+                else:
+                    print(f"\n--- Найдено на offset 0x{result['offset']:08X} ---")
                 for line in result['lines']:
                     print(line)
 
+    def multi_search_flow(self):
+        bf = self.choose_binary_file()
+        if not bf or not bf.exists():
+            print("Файл не найден.")
+            return
+
+        print("Введите паттерны в hex, по одному на строку (пустая строка - конец):")
+        patterns = []
+        while True:
+            hex_pattern = self.prompt('').strip()
+            if not hex_pattern:
+                break
+            try:
+                pattern = bytes.fromhex(hex_pattern)
+            except ValueError:
+                print("Ошибка: неверная hex-строка, паттерн пропущен")
+                continue
+            if pattern:
+                patterns.append(pattern)
+
+        if not patterns:
+            print("Паттерны не указаны.")
+            return
+
+        limit_str = self.prompt("Максимум совпадений на паттерн (по умолчанию 100): ").strip()
+        limit = int(limit_str) if limit_str.isdigit() else 100
+
+        results = bf.find_many(patterns, max_results=limit)
+
+        for pattern, offsets in results.items():
+            print(f"\nПаттерн {pattern.hex().upper()}: найдено {len(offsets)}")
+            for i, offset in enumerate(offsets[:10], 1):
+                print(f"  {i}. 0x{offset:08X} ({offset})")
+            if len(offsets) > 10:
+                print(f"  ... и еще {len(offsets) - 10} совпадений")
+
     def xor_encrypt_flow(self):
         bf = self.choose_binary_file()
         if not bf or not bf.exists():
@@ -309,6 +470,48 @@ class CLI:
         bf.invert_bytes(output)
         print(f"Байты инвертированы: {bf.path} → {output}")
 
+    def transform_pipeline_flow(self):
+        bf = self.choose_binary_file()
+        if not bf or not bf.exists():
+            print("Файл не найден.")
+            return
+
+        output = self.prompt("Выходной файл: ").strip()
+        if not output:
+            print("Выходной файл не указан.")
+            return
+
+        print("Введите шаги по одному на строку (пустая строка - конец):")
+        print("  xor <ключ>  |  xor hex:<ключ>  |  shift <N>  |  invert  |  table <512 hex-символов>")
+        pipeline = TransformPipeline()
+        while True:
+            line = self.prompt('').strip()
+            if not line:
+                break
+            command, _, arg = line.partition(' ')
+            command = command.lower()
+            arg = arg.strip()
+            try:
+                if command == 'xor':
+                    pipeline.xor(bytes.fromhex(arg[4:]) if arg.startswith('hex:') else arg.encode('utf-8'))
+                elif command == 'shift':
+                    pipeline.shift(int(arg))
+                elif command == 'invert':
+                    pipeline.invert()
+                elif command == 'table':
+                    pipeline.table(bytes.fromhex(arg))
+                else:
+                    print(f"Неизвестный шаг: {command}")
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+
+        if not pipeline.steps:
+            print("Шаги не указаны.")
+            return
+
+        bf.apply_pipeline(pipeline, output)
+        print(f"Цепочка из {len(pipeline.steps)} шагов применена: {bf.path} → {output}")
+
     def copy_file_flow(self):
         src = self.prompt("Исходный файл: ").strip()
         dst = self.prompt("Файл назначения: ").strip()
@@ -348,16 +551,66 @@ class CLI:
         else:
             print(f"Файлы различаются: {result.get('reason', 'Найдены различия')}")
 
-            if 'size1' in result:
+            if 'size1' in result and result['size1'] != result['size2']:
                 print(f"  Размер файла 1: {result['size1']} байт")
                 print(f"  Размер файла 2: {result['size2']} байт")
 
+            if result.get('diff_ranges'):
+                more = '+' if result['truncated'] else ''
+                print(f"\nДиапазоны различий ({len(result['diff_ranges'])}{more}, показано до 10):")
+                for i, diff in enumerate(result['diff_ranges'][:10], 1):
+                    print(f"  {i}. Offset 0x{diff['offset']:08X}: {diff['length']} байт")
+
+            if result.get('tail'):
+                tail = result['tail']
+                print(f"\nФайл {tail['file']} длиннее на {tail['length']} байт "
+                      f"(начиная с offset 0x{tail['offset']:08X})")
+
             if 'differences' in result and result['differences']:
                 print(f"\nПервые различия (показано до 10):")
                 for i, diff in enumerate(result['differences'][:10], 1):
                     print(f"  {i}. Offset 0x{diff['offset']:08X}: "
                           f"0x{diff['byte1']:02X} != 0x{diff['byte2']:02X}")
 
+    def create_patch_flow(self):
+        old_path = self.prompt("Старая версия файла: ").strip()
+        new_path = self.prompt("Новая версия файла: ").strip()
+        patch_path = self.prompt("Файл патча: ").strip()
+
+        if not old_path or not new_path or not patch_path:
+            print("Не указаны все пути.")
+            return
+        if not BinaryFile(old_path).exists() or not BinaryFile(new_path).exists():
+            print("Файл не найден.")
+            return
+
+        block_str = self.prompt(f"Размер блока (по умолчанию {BinaryDelta.DEFAULT_BLOCK_SIZE}): ").strip()
+        block_size = int(block_str) if block_str.isdigit() and int(block_str) > 0 else BinaryDelta.DEFAULT_BLOCK_SIZE
+
+        stats = BinaryDelta(block_size).create_patch(old_path, new_path, patch_path)
+        print(f"Патч создан: {patch_path} ({BinaryFile(patch_path).get_size()} байт)")
+        print(f"  Скопировано блоков: {stats['copied_blocks']}")
+        print(f"  Вставлено байтов: {stats['inserted_bytes']}")
+
+    def apply_patch_flow(self):
+        old_path = self.prompt("Старая версия файла: ").strip()
+        patch_path = self.prompt("Файл патча: ").strip()
+        output = self.prompt("Выходной файл: ").strip()
+
+        if not old_path or not patch_path or not output:
+            print("Не указаны все пути.")
+            return
+        if not BinaryFile(old_path).exists() or not BinaryFile(patch_path).exists():
+            print("Файл не найден.")
+            return
+
+        try:
+            BinaryDelta.apply_patch(old_path, patch_path, output)
+        except ValueError as e:
+            print(f"Ошибка: {e}")
+            return
+        print(f"Патч применен: {old_path} + {patch_path} → {output}")
+
     def analyze_binary_flow(self):
         bf = self.choose_binary_file()
         if not bf or not bf.exists():
@@ -370,18 +623,156 @@ class CLI:
 
         analyzer = BinaryAnalyzer(bf)
 
-        # Показываем краткую информацию
+        quick = self.prompt("Быстрая приближенная оценка по выборке блоков? (y/N): ").strip().lower() == 'y'
+        if quick:
+            self.print_estimate(analyzer.analyze_structure(approximate=True))
+            if self.prompt("Построить полный отчет? (y/N): ").strip().lower() != 'y':
+                return
+
+        # Показываем краткую информацию (отчет и сводка - за один проход по файлу)
         print("\nАнализ файла...")
-        analysis = analyzer.analyze_structure()
+        analysis = analyzer.write_report(report_path, threaded=True)
 
         print(f"Тип файла: {analysis['file_type']}")
         print(f"Размер: {analysis['size']} байт")
         print(f"Уникальных байтов: {analysis['unique_bytes']}/256")
         print(f"Энтропия: {analysis['entropy']:.4f}")
 
-        analyzer.write_report(report_path)
         print(f"\nПолный отчет сохранен в {report_path}")
 
+        profile_path = self.prompt("Сохранить профиль энтропии (.csv/.json, Enter - пропустить): ").strip()
+        if profile_path:
+            block_str = self.prompt("Размер блока (по умолчанию 65536): ").strip()
+            block_size = int(block_str) if block_str.isdigit() and int(block_str) > 0 else 64 * 1024
+            profile = analyzer.entropy_profile(block_size)
+            profile.save(profile_path)
+            print(f"[{profile.sparkline()}]")
+            print(f"Профиль ({len(profile.entropies)} блоков) сохранен в {profile_path}")
+
+    def print_estimate(self, analysis):
+        if not analysis.get('approximate'):
+            # Файл меньше выборки - посчитано точно
+            print(f"Тип файла: {analysis['file_type']}")
+            print(f"Энтропия: {analysis['entropy']:.4f}")
+            print(f"Нулевых байтов: {analysis['null_percentage']:.2f}%")
+            return
+
+        print(f"\n~ ОЦЕНКА по {analysis['sampled_blocks']} блокам "
+              f"({analysis['sampled_bytes']} из {analysis['size']} байт), интервалы 95% ~")
+        print(f"Тип файла (по заголовку, точно): {analysis['file_type']}")
+        low, high = analysis['entropy_ci']
+        print(f"Энтропия (оценка): {analysis['entropy']:.4f}  [{low:.4f} .. {high:.4f}]")
+        low, high = analysis['null_percentage_ci']
+        print(f"Нулевых байтов (оценка): {analysis['null_percentage']:.2f}%  [{low:.2f}% .. {high:.2f}%]")
+        print(f"Уникальных байтов (не менее): {analysis['unique_bytes']}/256")
+        print("Частые байты (оценка):")
+        for item in analysis['most_common_bytes'][:5]:
+            low, high = item['percentage_ci']
+            print(f"  {item['byte']} '{item['ascii']}': {item['percentage']:.2f}%  [{low:.2f}% .. {high:.2f}%]")
+        print("Состав файла (оценка доли блоков):")
+        for item in analysis['composition']:
+            low, high = item['percentage_ci']
+            print(f"  {item['kind']:<32} {item['percentage']:6.2f}%  [{low:.2f}% .. {high:.2f}%]")
+
+    def detect_types_flow(self):
+        directory = self.prompt("Каталог: ").strip()
+        if not directory or not os.path.isdir(directory):
+            print("Каталог не найден.")
+            return
+
+        signatures_path = self.prompt("Файл дополнительных сигнатур (Enter - пропустить): ").strip()
+        if signatures_path:
+            try:
+                loaded = BinaryAnalyzer.load_signatures(signatures_path)
+            except (OSError, ValueError) as e:
+                print(f"Ошибка: {e}")
+                return
+            print(f"Загружено сигнатур: {loaded}")
+
+        recursive = self.prompt("Включая подкаталоги? (y/N): ").strip().lower() == 'y'
+        if recursive:
+            paths = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+        else:
+            paths = [entry.path for entry in os.scandir(directory) if entry.is_file()]
+
+        if not paths:
+            print("Файлы не найдены.")
+            return
+
+        types = BinaryAnalyzer.detect_file_types(sorted(paths))
+        summary = {}
+        for path, file_type in types.items():
+            file_type = file_type or 'Ошибка чтения'
+            summary[file_type] = summary.get(file_type, 0) + 1
+            print(f"  {file_type:<40} {path}")
+
+        print(f"\nВсего файлов: {len(types)}")
+        for file_type, count in sorted(summary.items(), key=lambda x: x[1], reverse=True):
+            print(f"  {file_type}: {count}")
+
+    def carve_flow(self):
+        bf = self.choose_binary_file()
+        if not bf or not bf.exists():
+            print("Файл не найден.")
+            return
+
+        print("\nПоиск встроенных файлов...")
+        result = BinaryAnalyzer(bf).carve()
+        hits = result['hits']
+        if not hits:
+            print("Встроенные файлы не найдены.")
+            return
+
+        print(f"{'Offset':>12}  {'Длина':>12}  {'Источник':<9} Тип")
+        for hit in hits:
+            print(f"  0x{hit['offset']:08X}  {hit['length']:>12}  {hit['length_source']:<9} {hit['type']}")
+        print(f"\nНайдено: {len(hits)}")
+        if result['truncated']:
+            print("Показаны не все вхождения (достигнут лимит).")
+
+        output_dir = self.prompt("Каталог для извлечения (Enter - пропустить): ").strip()
+        if output_dir:
+            try:
+                paths = BinaryAnalyzer(bf).extract_carved(hits, output_dir)
+            except OSError as e:
+                print(f"Ошибка: {e}")
+                return
+            print(f"Извлечено файлов: {len(paths)} в {output_dir}")
+
+    def export_dump_flow(self):
+        bf = self.choose_binary_file()
+        if not bf or not bf.exists():
+            print("Файл не найден.")
+            return
+
+        fmt = self.prompt("Формат (hexdump / xxd, по умолчанию hexdump): ").strip().lower() or 'hexdump'
+        if fmt not in ('hexdump', 'xxd'):
+            print("Неизвестный формат.")
+            return
+        output_path = self.prompt("Файл дампа (Enter - вывод на экран): ").strip()
+
+        viewer = HexViewer(bf)
+        if not output_path:
+            viewer.export_dump(sys.stdout, fmt)
+            return
+        with open(output_path, mode='w', encoding='ascii') as out:
+            size = viewer.export_dump(out, fmt)
+        print(f"Дамп {size} байт сохранен в {output_path}")
+
+    def import_dump_flow(self):
+        dump_path = self.prompt("Файл дампа (hexdump -C / xxd): ").strip()
+        output_path = self.prompt("Восстановленный файл: ").strip()
+        if not dump_path or not output_path:
+            print("Не указаны все пути.")
+            return
+
+        try:
+            size = HexViewer.import_dump(dump_path, output_path)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка: {e}")
+            return
+        print(f"Восстановлено {size} байт в {output_path}")
+
     def rename_file_flow(self):
         old_path = self.prompt("Текущий путь к файлу: ").strip()
         if not old_path:
@@ -450,6 +841,16 @@ class CLI:
         print("\n--- Lab5 ---")
         print("19) Сравнение производительности копирования")
         print("20) Чтение конфигурационного файла")
+        print("\n--- Расширенные операции ---")
+        print("21) Поиск нескольких байтовых последовательностей")
+        print("22) Цепочка преобразований байтов")
+        print("23) Создание бинарного патча (дельты)")
+        print("24) Применение бинарного патча")
+        print("25) Определение типов файлов в каталоге")
+        print("26) Поиск встроенных файлов (carving)")
+        print("27) Экспорт hex-дампа (hexdump -C / xxd)")
+        print("28) Восстановление файла из hex-дампа")
+        print("29) Множественная замена (правила из файла)")
 
         print("\n0)  Выход")
 
@@ -506,6 +907,26 @@ class CLI:
             elif choice == '20':
                 self.read_config_flow()
 
+            # Расширенные операции
+            elif choice == '21':
+                self.multi_search_flow()
+            elif choice == '22':
+                self.transform_pipeline_flow()
+            elif choice == '23':
+                self.create_patch_flow()
+            elif choice == '24':
+                self.apply_patch_flow()
+            elif choice == '25':
+                self.detect_types_flow()
+            elif choice == '26':
+                self.carve_flow()
+            elif choice == '27':
+                self.export_dump_flow()
+            elif choice == '28':
+                self.import_dump_flow()
+            elif choice == '29':
+                self.replace_rules_flow()
+
 
 
             elif choice == '0':